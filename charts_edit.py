@@ -1,20 +1,639 @@
 import dash
-from dash import dcc, html, Input, Output, State, callback_context, dash_table
+import flask
+from dash import dcc, html, Input, Output, State, Patch, callback_context, dash_table
 from dash.dependencies import ALL
 import plotly.graph_objs as go
 import pandas as pd
+import numpy as np
 import io
+import abc
 import base64
+import csv
+import functools
+import hashlib
+import itertools
 import json
+import math
+import os
+import pickle
+import re
+import tempfile
+import threading
+import uuid
+import zlib
+from collections import OrderedDict
+from contextlib import contextmanager
+from pandas.api.types import union_categoricals
+from urllib.parse import urlencode
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to in-process locking only
+    fcntl = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+except ImportError:  # the parsed-upload cache and Parquet/Feather export are optional
+    pa = feather = pq = None
+
+try:
+    import zstandard
+except ImportError:  # zstd compression of text exports is optional
+    zstandard = None
 
 # Initialize the Dash app
 app = dash.Dash(__name__)
+server = app.server
+
+# Session storage configuration ("memory" for a single worker, "disk" for several)
+STORE_BACKEND = os.environ.get('CHARTS_EDIT_STORE', 'memory')
+STORE_DIR = os.environ.get('CHARTS_EDIT_STORE_DIR', os.path.join(tempfile.gettempdir(), 'charts_edit_sessions'))
+STORE_MAX_BYTES = int(os.environ.get('CHARTS_EDIT_STORE_MAX_BYTES', 1024 * 1024 * 1024))
+# Row data of recently used sessions each "disk" worker keeps unpickled in memory
+STORE_CACHE_BYTES = int(os.environ.get('CHARTS_EDIT_STORE_CACHE_BYTES', 256 * 1024 * 1024))
+
+# Uploads above this size are spooled to a temp file and parsed in row chunks
+STREAM_THRESHOLD_BYTES = int(os.environ.get('CHARTS_EDIT_STREAM_THRESHOLD', 16 * 1024 * 1024))
+DECODE_CHUNK_CHARS = 4 * 1024 * 1024  # multiple of 4, so every base64 slice decodes on its own
+PARSE_CHUNK_ROWS = 250_000
+
+# Species/site/description columns used by the filters (stored as Categorical and indexed)
+FILTER_COLUMNS = ['Sc', 'SiteC', 'Description']
+FILTER_INDEX_CACHE_SIZE = 16
+VIEW_CACHE_SIZE = 32  # memoized filtered views / plot statistics per worker
+TABLE_PAGE_SIZE = 20  # rows per page of the data table
+FIGURE_MAP_CACHE_SIZE = 64  # row -> trace position maps of the last figure sent to each session
+MARKER_OVERLAY = 'phenology-marker'  # name of the marker shapes/annotations, replaced as a group in the browser
+
+# Above this many filtered points the plot switches to WebGL (Scattergl) traces
+WEBGL_THRESHOLD = int(os.environ.get('CHARTS_EDIT_WEBGL_THRESHOLD', 20000))
+
+# Level of detail: each trend trace draws at most this many points of the visible X window
+LOD_MAX_POINTS = int(os.environ.get('CHARTS_EDIT_LOD_POINTS', 2000))
 
-# Global variable to store data
-data_store = {'df': None, 'original_df': None, 'x_col': None, 'y_col': None, 'markers': []}
+# Arrow-key moves are shown in the browser at once and saved after this long without another key press
+NUDGE_COMMIT_DELAY_MS = int(os.environ.get('CHARTS_EDIT_NUDGE_DELAY_MS', 300))
+
+# Upper bound on rows a single "Fill Gaps" run may add
+GAP_FILL_MAX_ROWS = int(os.environ.get('CHARTS_EDIT_GAP_FILL_MAX_ROWS', 1000000))
+
+# Load-time schema: bytes sampled for delimiter sniffing, and which other text columns become Categorical
+SNIFF_BYTES = 64 * 1024
+CATEGORY_MAX_RATIO = 0.5  # other text columns qualify when unique values <= 50% of rows
+
+# Parsed uploads are cached as Feather files keyed by content hash (needs pyarrow)
+CACHE_DIR = os.environ.get('CHARTS_EDIT_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'charts_edit_cache'))
+CACHE_MAX_BYTES = int(os.environ.get('CHARTS_EDIT_CACHE_MAX_BYTES', 4 * 1024 * 1024 * 1024))
+
+# Downloads are streamed from a plain Flask route, written EXPORT_CHUNK_ROWS rows at a time
+EXPORT_CHUNK_ROWS = int(os.environ.get('CHARTS_EDIT_EXPORT_CHUNK_ROWS', 100_000))
+EXPORT_FORMATS = {  # format -> (file extension, MIME type)
+    'tsv': ('.tsv', 'text/tab-separated-values'),
+    'csv': ('.csv', 'text/csv'),
+    'parquet': ('.parquet', 'application/vnd.apache.parquet'),
+    'feather': ('.feather', 'application/vnd.apache.arrow.file'),
+    'patch': ('.patch.json', 'application/json'),  # changes against the original upload, see diff_frames
+}
+EXPORT_COMPRESSION_SUFFIXES = {'none': '', 'gzip': '.gz', 'zstd': '.zst'}
+
+# Edits are journaled per session so sessions can be replayed after a restart ('' disables)
+JOURNAL_DIR = os.environ.get('CHARTS_EDIT_JOURNAL_DIR', os.path.join(tempfile.gettempdir(), 'charts_edit_journal'))
+JOURNAL_COMPACT_BYTES = int(os.environ.get('CHARTS_EDIT_JOURNAL_COMPACT_BYTES', 4 * 1024 * 1024))
+JOURNAL_MAX_BYTES = int(os.environ.get('CHARTS_EDIT_JOURNAL_MAX_BYTES', 4 * 1024 * 1024 * 1024))
+JOURNAL_FIELDS = ('x_col', 'y_col', 'markers')  # small session fields restored with the edits
+
+
+def new_session_state():
+    """
+    Empty editing state for a browser session. 'rows' is the RowBuffer holding
+    the data; 'df' is its current frame, refreshed by the store on every write.
+    'edit_log' holds the undo/redo history, journal_seq the last journaled record.
+    'selection' holds the row IDs of the last box/lasso selection.
+    """
+    return {'rows': None, 'df': None, 'edit_log': None, 'x_col': None, 'y_col': None, 'markers': [],
+            'dataset_id': None, 'version': 0, 'rows_version': 0, 'source_key': None, 'journal_seq': 0,
+            'selection': None}
+
+
+def dataset_token(session):
+    """Small handle sent to the browser in place of the data itself"""
+    if session['dataset_id'] is None:
+        return None
+    return {'dataset': session['dataset_id'], 'version': session['version']}
+
+
+def state_nbytes(state):
+    """Approximate memory held by a session state (DataFrames dominate)"""
+    total = 0
+    for key, value in state.items():
+        if isinstance(value, (RowBuffer, EditLog)):
+            total += value.nbytes
+        elif isinstance(value, pd.DataFrame) and key != 'df':  # 'df' views the RowBuffer
+            total += int(value.memory_usage(index=True, deep=True).sum())
+    return total
+
+def sync_frame(state):
+    """Point state['df'] at the current frame of its RowBuffer"""
+    state['df'] = state['rows'].frame() if state.get('rows') is not None else None
+    return state
+
+
+def private_directory(directory):
+    """
+    Create directory accessible only to this user, or check that an existing
+    one is. Session files in it are unpickled, so a directory someone else
+    owns or can write to (e.g. one planted under the shared temp dir) is
+    refused rather than loaded from.
+    """
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    st = os.stat(directory)
+    if hasattr(os, 'getuid') and (st.st_uid != os.getuid() or st.st_mode & 0o022):
+        raise PermissionError(f"{directory} must be owned by this user and not writable by others")
+    return directory
+
+
+def evict_oldest(directory, suffixes, max_bytes, keep=()):
+    """Delete the least recently modified files with these suffixes (except keep) until the directory fits max_bytes"""
+    entries = []
+    for name in os.listdir(directory):
+        if name.endswith(suffixes):
+            path = os.path.join(directory, name)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        if path not in keep:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+class SessionStore(abc.ABC):
+    """
+    Session-keyed storage for editing state.
+
+    Callbacks read with get() and write only the fields they changed with
+    update(), so concurrent callbacks of the same session never clobber each
+    other's fields. Callbacks that change the rows or edit log in place hold
+    lock() from their read to their write (see with_session_lock), so edits
+    of one session are applied one after another.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        self._held = threading.local()  # sessions whose lock this thread holds
+
+    def get(self, session_id):
+        if not session_id:
+            return new_session_state()
+        state = self._read(session_id)
+        if state is None:
+            state = self._recover(session_id)
+        return state if state is not None else new_session_state()
+
+    def update(self, session_id, **fields):
+        if not session_id:
+            return
+        with self.lock(session_id):
+            state = self._read(session_id) or new_session_state()
+            state.update(fields)
+            journaled = {field: fields[field] for field in JOURNAL_FIELDS if field in fields}
+            if journaled:
+                edit_journal.append(session_id, state, ('state', journaled))
+            self._write(session_id, sync_frame(state))
+
+    def bump_version(self, session_id, rows_changed=False, journal=None, **fields):
+        """
+        Store edited fields and advance the dataset version; returns the new state.
+        rows_changed marks edits that add/remove rows or touch a filter column,
+        which invalidates the filter index. journal is the EditJournal record
+        of the change, if any.
+        """
+        with self.lock(session_id):
+            state = self._read(session_id) or new_session_state()
+            state.update(fields)
+            state['version'] += 1
+            if rows_changed:
+                state['rows_version'] += 1
+            if journal is not None:
+                edit_journal.append(session_id, state, journal)
+            self._write(session_id, sync_frame(state))
+            return state
+
+    def _recover(self, session_id):
+        """Rebuild a session lost to a restart or eviction from its edit journal"""
+        with self.lock(session_id):
+            state = self._read(session_id)
+            if state is None:
+                state = edit_journal.replay(session_id)
+                if state is not None:
+                    self._write(session_id, sync_frame(state))
+            return state
+
+    def delete(self, session_id):
+        with self.lock(session_id):
+            self._remove(session_id)
+
+    @contextmanager
+    def lock(self, session_id):
+        """Exclusive access to one session; re-entrant, so a holder can still call get()/update()/bump_version()"""
+        held = getattr(self._held, 'sessions', None)
+        if held is None:
+            held = self._held.sessions = set()
+        if session_id in held:
+            yield
+            return
+        with self._acquire(session_id):
+            held.add(session_id)
+            try:
+                yield
+            finally:
+                held.discard(session_id)
+
+    @contextmanager
+    def _acquire(self, session_id):
+        with self._locks_guard:
+            thread_lock = self._locks.setdefault(session_id, threading.Lock())
+        with thread_lock:
+            yield
+
+    @abc.abstractmethod
+    def _read(self, session_id):
+        """Stored state of the session, or None if there is none"""
+
+    @abc.abstractmethod
+    def _write(self, session_id, state):
+        """Store the session's full state"""
+
+    @abc.abstractmethod
+    def _remove(self, session_id):
+        """Drop the session's state, if stored"""
+
+
+class MemorySessionStore(SessionStore):
+    """In-process LRU store that evicts the least recently used sessions above max_bytes"""
+
+    def __init__(self, max_bytes):
+        super().__init__(max_bytes)
+        self._items = OrderedDict()
+        self._sizes = {}
+        self._guard = threading.Lock()
+
+    def _read(self, session_id):
+        with self._guard:
+            state = self._items.get(session_id)
+            if state is not None:
+                self._items.move_to_end(session_id)
+            return state
+
+    def _write(self, session_id, state):
+        with self._guard:
+            self._items[session_id] = state
+            self._items.move_to_end(session_id)
+            self._sizes[session_id] = state_nbytes(state)
+            # Evict old sessions, but always keep the one just written
+            while sum(self._sizes.values()) > self.max_bytes and len(self._items) > 1:
+                evicted, _ = self._items.popitem(last=False)
+                self._sizes.pop(evicted, None)
+
+    def _remove(self, session_id):
+        with self._guard:
+            self._items.pop(session_id, None)
+            self._sizes.pop(session_id, None)
+
+
+class DiskSessionStore(SessionStore):
+    """
+    Pickles each session to files so several worker processes share state.
+
+    The small fields (markers, columns, selection, ...) live in <id>.pkl and
+    are rewritten on every write; the rows and edit log live in <id>.rows.pkl,
+    tagged with the (dataset_id, version) they belong to, and are rewritten
+    only when that changes. Each process keeps the row data it last used in
+    memory under the same tag, so most reads only unpickle the small fields.
+    """
+
+    ROW_FIELDS = ('rows', 'edit_log')
+
+    def __init__(self, directory, max_bytes, cache_bytes):
+        super().__init__(max_bytes)
+        self.directory = directory
+        self.cache_bytes = cache_bytes
+        self._rows_cache = OrderedDict()  # session_id -> ((dataset_id, version), row fields, nbytes)
+        self._guard = threading.Lock()
+        private_directory(directory)
+
+    def _path(self, session_id, suffix='.pkl'):
+        # Session ids come from the browser - never let them escape the store directory
+        safe_id = ''.join(ch for ch in str(session_id) if ch.isalnum() or ch in '-_')
+        return os.path.join(self.directory, safe_id + suffix)
+
+    @contextmanager
+    def _acquire(self, session_id):
+        with super()._acquire(session_id):
+            if fcntl is None:
+                yield
+                return
+            with open(self._path(session_id, '.lock'), 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _load(self, path):
+        try:
+            with open(path, 'rb') as f:
+                return pickle.load(f)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            return None
+
+    def _dump(self, path, obj):
+        # Write to a temp file and rename so readers never see a partial pickle
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    def _cached_rows(self, session_id, tag):
+        with self._guard:
+            entry = self._rows_cache.get(session_id)
+            if entry is None or entry[0] != tag:
+                return None
+            self._rows_cache.move_to_end(session_id)
+            return entry[1]
+
+    def _cache_rows(self, session_id, tag, row_fields):
+        nbytes = sum(value.nbytes for value in row_fields.values() if value is not None)
+        with self._guard:
+            self._rows_cache[session_id] = (tag, row_fields, nbytes)
+            self._rows_cache.move_to_end(session_id)
+            while (sum(entry[2] for entry in self._rows_cache.values()) > self.cache_bytes
+                   and len(self._rows_cache) > 1):
+                self._rows_cache.popitem(last=False)
+
+    def _read(self, session_id):
+        state = self._load(self._path(session_id))
+        if state is None:
+            return None
+        tag = (state['dataset_id'], state['version'])
+        row_fields = self._cached_rows(session_id, tag)
+        if row_fields is None:
+            stored = self._load(self._path(session_id, '.rows.pkl'))
+            if stored is None or stored[0] != tag:
+                return None  # evicted, or read between the two files' writes (recovery re-reads under the lock)
+            row_fields = stored[1]
+            self._cache_rows(session_id, tag, row_fields)
+        state.update(row_fields)
+        return sync_frame(state)
+
+    def _write(self, session_id, state):
+        tag = (state['dataset_id'], state['version'])
+        row_fields = {field: state[field] for field in self.ROW_FIELDS}
+        cached = self._cached_rows(session_id, tag)
+        if cached is None or any(cached[field] is not row_fields[field] for field in self.ROW_FIELDS):
+            self._dump(self._path(session_id, '.rows.pkl'), (tag, row_fields))
+            self._cache_rows(session_id, tag, row_fields)
+        # The frame is rebuilt from the RowBuffer on read
+        self._dump(self._path(session_id), {key: value for key, value in state.items()
+                                            if key not in self.ROW_FIELDS and key != 'df'})
+        evict_oldest(self.directory, ('.pkl',), self.max_bytes,
+                     keep=(self._path(session_id), self._path(session_id, '.rows.pkl')))
+
+    def _remove(self, session_id):
+        with self._guard:
+            self._rows_cache.pop(session_id, None)
+        for suffix in ('.pkl', '.rows.pkl', '.lock'):
+            try:
+                os.remove(self._path(session_id, suffix))
+            except FileNotFoundError:
+                pass
+
+
+class FrameCache:
+    """
+    Content-addressed Feather files of parsed, dtype-normalized uploads.
+
+    Files are written uncompressed so they can be memory-mapped on reload;
+    a hit refreshes the file's mtime and the oldest files are evicted once
+    the directory grows past max_bytes. Numeric columns of a returned frame
+    are read-only views of the mapped file rather than copies in RAM, so
+    callers copy before writing (RowBuffer does).
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.enabled = feather is not None
+        if self.enabled:
+            os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.feather')
+
+    def get(self, key):
+        if not self.enabled or not key:
+            return None
+        path = self._path(key)
+        try:
+            table = feather.read_table(path, memory_map=True)
+            # split_blocks keeps each column in its own block, so nothing is consolidated into a copy
+            df = table.to_pandas(split_blocks=True)
+            os.utime(path)
+        except (OSError, pa.ArrowException):
+            return None  # missing, or a truncated/corrupt file: parse the upload again
+        return df
+
+    def put(self, key, df):
+        """Cache a frame; returns False if it could not be stored"""
+        if not self.enabled or not key:
+            return False
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        os.close(fd)
+        try:
+            df.reset_index(drop=True).to_feather(tmp_path, compression='uncompressed')
+            os.replace(tmp_path, self._path(key))
+        except Exception:
+            # Unsupported column types etc. - the app works without the cache
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return False
+        evict_oldest(self.directory, ('.feather',), self.max_bytes, keep=(self._path(key),))
+        return True
+
+
+class EditJournal:
+    """
+    Per-session edit journal on disk, so an editing session survives a worker
+    restart or eviction from the session store.
+
+    <session>.journal starts with a header naming the upload, followed by one
+    pickled (seq, kind, ...) record per action: 'edit' with the EditLog entry,
+    'undo', 'redo', 'reset', or 'state' with changed plot columns/markers.
+    Replay rebuilds the session from the <session>.ckpt checkpoint of rows and
+    undo history plus the records after it. The checkpoint is written when the
+    journal starts - the upload cache may evict the file before a restart -
+    and again (restarting the journal) once the journal grows past
+    compact_bytes, which keeps replay time bounded. Records are flushed as
+    they are written, so they survive the process being killed; a torn or
+    unreadable tail is cut off at the last good record on replay.
+    """
+
+    def __init__(self, directory, compact_bytes, max_bytes):
+        self.directory = directory
+        self.compact_bytes = compact_bytes
+        self.max_bytes = max_bytes
+        self.enabled = bool(directory)
+        if self.enabled:
+            private_directory(directory)  # journals and checkpoints are unpickled on replay
+
+    def _path(self, session_id, suffix='.journal'):
+        safe_id = ''.join(ch for ch in str(session_id) if ch.isalnum() or ch in '-_')
+        return os.path.join(self.directory, safe_id + suffix)
+
+    def _write_atomic(self, path, *objects):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            for obj in objects:
+                pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    def start(self, session_id, state):
+        """Begin a new journal for a fresh upload, checkpointed from the start"""
+        if not self.enabled or not session_id:
+            return
+        evict_oldest(self.directory, ('.journal', '.ckpt'), self.max_bytes)
+        self.checkpoint(session_id, state)
+
+    def append(self, session_id, state, record):
+        """Write one record (a tuple starting with its kind) and advance state['journal_seq']"""
+        path = self._path(session_id)
+        if not self.enabled or not session_id or not os.path.exists(path):
+            return
+        state['journal_seq'] += 1
+        if record[0] == 'edit':
+            record = ('edit', self.encode_entry(record[1]))
+        with open(path, 'ab') as f:
+            pickle.dump((state['journal_seq'], *record), f, protocol=pickle.HIGHEST_PROTOCOL)
+        if os.path.getsize(path) > self.compact_bytes:
+            self.checkpoint(session_id, state)
+
+    def checkpoint(self, session_id, state):
+        """Snapshot rows and undo history, then restart the journal after them"""
+        snapshot = {'seq': state['journal_seq'], 'rows': state['rows'], 'edit_log': state['edit_log'],
+                    'fields': {field: state[field] for field in JOURNAL_FIELDS}}
+        self._write_atomic(self._path(session_id, '.ckpt'), snapshot)
+        # A crash before this rewrite is harmless: records up to snapshot['seq'] are skipped on replay
+        self._write_atomic(self._path(session_id), {'source_key': state['source_key']})
+
+    def replay(self, session_id):
+        """Session state rebuilt from the journal, or None if there is nothing to recover"""
+        if not self.enabled or not session_id:
+            return None
+        path = self._path(session_id)
+        records, end = [], None
+        try:
+            with open(path, 'rb') as f:
+                header = pickle.load(f)
+                while True:
+                    offset = f.tell()
+                    try:
+                        records.append((offset, pickle.load(f)))
+                    except EOFError:
+                        break
+                    except Exception:
+                        end = offset  # torn or corrupt tail of a killed process
+                        break
+            with open(self._path(session_id, '.ckpt'), 'rb') as f:
+                snapshot = pickle.load(f)
+        except Exception:
+            return None  # no journal, or an unreadable header/checkpoint
+
+        rows, edit_log, seq = snapshot['rows'], snapshot['edit_log'], snapshot['seq']
+        state = new_session_state()
+        state.update(snapshot['fields'])
+        for offset, record in records:
+            try:
+                if record[0] <= snapshot['seq']:
+                    continue
+                kind = record[1]
+                if kind == 'edit':
+                    entry = self.decode_entry(record[2])
+                    apply_edit(rows, entry)
+                    edit_log.record(entry)
+                elif kind == 'undo':
+                    edit_log.undo(rows)
+                elif kind == 'redo':
+                    edit_log.redo(rows)
+                elif kind == 'reset':
+                    edit_log.undo_all(rows)
+                elif kind == 'state':
+                    state.update(record[2])
+                seq = record[0]
+            except Exception:
+                end = offset  # a record that no longer applies ends the recoverable history
+                break
+
+        if end is not None:
+            # Later appends must follow the last good record, not the garbage after it
+            os.truncate(path, end)
+        state.update(rows=rows, edit_log=edit_log, source_key=header['source_key'], journal_seq=seq,
+                     dataset_id=uuid.uuid4().hex, version=1, rows_version=1)
+        return state
+
+    @staticmethod
+    def encode_entry(entry):
+        """EditLog entry as plain Python values"""
+        if entry['op'] == 'set':
+            return {'op': 'set', 'cells': [(int(row_id), col, plain_value(old), plain_value(new))
+                                           for row_id, col, old, new in entry['cells']]}
+        rows = entry['rows']
+        return {'op': entry['op'], 'ids': rows.index.tolist(),
+                'values': {col: [plain_value(value) for value in rows[col].to_numpy()] for col in rows.columns}}
+
+    @staticmethod
+    def decode_entry(record):
+        if record['op'] == 'set':
+            return record
+        return {'op': record['op'], 'rows': pd.DataFrame(record['values'], index=record['ids'])}
+
+
+upload_cache = FrameCache(CACHE_DIR, CACHE_MAX_BYTES)
+edit_journal = EditJournal(JOURNAL_DIR, JOURNAL_COMPACT_BYTES, JOURNAL_MAX_BYTES)
+
+if STORE_BACKEND == 'disk':
+    session_store = DiskSessionStore(STORE_DIR, STORE_MAX_BYTES, STORE_CACHE_BYTES)
+else:
+    session_store = MemorySessionStore(STORE_MAX_BYTES)
+
+def with_session_lock(callback):
+    """
+    Run a callback that edits a session's rows (session_id is its last
+    argument) under the session lock, from its get() to its bump_version(),
+    so two edits of the same session never interleave.
+    """
+    @functools.wraps(callback)
+    def locked(*args):
+        with session_store.lock(args[-1]):
+            return callback(*args)
+    return locked
 
 app.layout = html.Div([
     html.H1("FM-Trace Editor", style={'textAlign': 'center', 'marginBottom': 30}),
+
+    # Per-tab session key for the server-side store
+    dcc.Store(id='session-id', storage_type='session'),
     
     # File upload section
     html.Div([
@@ -29,10 +648,45 @@ app.layout = html.Div([
             },
             multiple=False
         ),
-        html.Div(id='upload-status'),
+        dcc.Loading(html.Div(id='upload-status'), type='dot'),
+        html.Div(id='upload-progress', style={'margin': '0 10px', 'color': '#666'}),
+        dcc.Interval(id='upload-progress-poll', interval=500, disabled=True),
         html.Button('Download Modified Data', id='download-btn', style={'margin': '10px'}),
-        dcc.Download(id="download-data"),
         html.Button('Reset Changes', id='reset-btn', style={'margin': '10px'}),
+        html.Button('↶ Undo', id='undo-btn', style={'margin': '10px'}),
+        html.Button('↷ Redo', id='redo-btn', style={'margin': '10px'}),
+        html.Div([
+            html.Label("Format: "),
+            dcc.Dropdown(id='export-format', clearable=False, value='tsv', style={'width': '160px'}, options=[
+                {'label': 'Tab-separated', 'value': 'tsv'},
+                {'label': 'CSV', 'value': 'csv'},
+                {'label': 'Parquet', 'value': 'parquet'},
+                {'label': 'Feather', 'value': 'feather'},
+                {'label': 'Patch (changes only)', 'value': 'patch'},
+            ]),
+            html.Label("Compression: "),
+            dcc.Dropdown(id='export-compression', clearable=False, value='none', style={'width': '120px'}, options=[
+                {'label': 'None', 'value': 'none'},
+                {'label': 'gzip', 'value': 'gzip'},
+                {'label': 'zstd', 'value': 'zstd'},
+            ]),
+            dcc.Checklist(id='export-scope', value=[], inline=True, options=[
+                {'label': ' Filtered rows only', 'value': 'filtered'},
+                {'label': ' Changed rows only', 'value': 'changed'},
+            ], inputStyle={'marginLeft': '10px'}),
+        ], style={'display': 'flex', 'alignItems': 'center', 'gap': '10px', 'margin': '10px'}),
+        html.Div(id='export-status', style={'margin': '10px'}),
+        dcc.Store(id='export-url'),
+        dcc.Upload(
+            id='patch-upload',
+            children=html.Div(['Apply a patch to the loaded file: Drag and Drop or ', html.A('Select Patch File')]),
+            style={
+                'width': '100%', 'height': '40px', 'lineHeight': '40px',
+                'borderWidth': '1px', 'borderStyle': 'dashed', 'borderRadius': '5px',
+                'textAlign': 'center', 'margin': '10px'
+            },
+            multiple=False
+        ),
     ], style={'marginBottom': 30, 'padding': 20, 'border': '1px solid #ddd', 'borderRadius': 5}),
     
     # Instructions
@@ -42,7 +696,7 @@ app.layout = html.Div([
         html.P("📅 Add vertical marker lines for important phenological dates"),
         html.P("📈 Blue/colored lines show species-specific trends"),
         html.P("🎯 Red circles are editable points - click to select for editing"),
-        html.P("⌨️ Keyboard shortcuts: Arrow keys move selected points (←→ X-axis, ↑↓ Y-axis)"),
+        html.P("⌨️ Keyboard shortcuts: Arrow keys move selected points (←→ X-axis, ↑↓ Y-axis), Ctrl+Z / Ctrl+Y undo and redo"),
         html.P("🧠 Smart interpolation: New points calculate realistic values for all parameters"),
         html.P("⌨️ Use fine-tune buttons for precise species-specific adjustments"),
     ], style={'backgroundColor': '#f8f9fa', 'padding': 15, 'borderRadius': 5, 'marginBottom': 20}),
@@ -149,7 +803,7 @@ app.layout = html.Div([
         # Fine-tune controls
         html.Div([
             html.H5("⌨️ Fine-tune Selected Point (Arrow Keys or Buttons)"),
-            html.P("🎮 Use keyboard: ← → for X-axis, ↑ ↓ for Y-axis", 
+            html.P("🎮 Use keyboard: ← → for X-axis, ↑ ↓ for Y-axis (moves show instantly and are saved after a short pause)", 
                 style={'fontSize': '12px', 'color': '#6c757d', 'marginBottom': 10}),
             html.Div([
                 html.Button('← X-1 (←)', id='x-minus-btn', style={'margin': '2px', 'padding': '5px 10px'}),
@@ -161,6 +815,25 @@ app.layout = html.Div([
             ], style={'display': 'flex', 'alignItems': 'center', 'gap': '5px'}),
         ], style={'marginBottom': 15, 'padding': 15, 'backgroundColor': '#fff3cd', 'borderRadius': 5}),
         
+        # Bulk edit of a box/lasso selection
+        html.Div([
+            html.H5("🔲 Bulk Edit Selection (Box or Lasso Select on the plot)"),
+            html.P("🧮 Selects every filtered point inside the drawn area, including points hidden by downsampling", 
+                style={'fontSize': '12px', 'color': '#6c757d', 'marginBottom': 10}),
+            html.Div(id='selection-status', children="No points selected", style={'fontWeight': 'bold', 'color': 'blue', 'marginBottom': 10}),
+            html.Div([
+                html.Label("Shift X: "),
+                dcc.Input(id='bulk-dx', type='number', value=0, step=0.01, style={'width': '80px'}),
+                html.Label("Shift Y: "),
+                dcc.Input(id='bulk-dy', type='number', value=0, step=0.01, style={'width': '80px'}),
+                html.Button('Shift', id='bulk-shift-btn', style={'backgroundColor': '#007bff', 'color': 'white', 'border': 'none', 'padding': '5px 15px', 'borderRadius': '4px', 'marginRight': 20}),
+                html.Label("Scale Y: "),
+                dcc.Input(id='bulk-scale', type='number', value=1, step=0.01, style={'width': '80px'}),
+                html.Button('Scale', id='bulk-scale-btn', style={'backgroundColor': '#007bff', 'color': 'white', 'border': 'none', 'padding': '5px 15px', 'borderRadius': '4px', 'marginRight': 20}),
+                html.Button('Delete Selected', id='bulk-delete-btn', style={'backgroundColor': '#dc3545', 'color': 'white', 'border': 'none', 'padding': '5px 15px', 'borderRadius': '4px'}),
+            ], style={'display': 'flex', 'alignItems': 'center', 'gap': '10px'}),
+        ], style={'marginBottom': 15, 'padding': 15, 'backgroundColor': '#f8d7da', 'borderRadius': 5}),
+        
         # Add new point
         html.Div([
             html.H5("➕ Add New Point (Smart Interpolation)"),
@@ -176,11 +849,27 @@ app.layout = html.Div([
             html.Div(id='add-point-status', style={'marginTop': 10, 'fontSize': '14px'}),
         ], style={'padding': 15, 'backgroundColor': '#d1ecf1', 'borderRadius': 5}),
         
+        # Fill missing X values of every species/site group at once
+        html.Div([
+            html.H5("📅 Fill Gaps (per Species/Site)"),
+            html.P("🧠 Adds an interpolated point at every missing X step between each group's first and last point", 
+                style={'fontSize': '12px', 'color': '#6c757d', 'marginBottom': 10}),
+            html.Div([
+                html.Label("Step: "),
+                dcc.Input(id='gap-step', type='number', min=0.01, step=0.01, value=1, style={'width': '100px', 'marginRight': 15}),
+                html.Button('Fill Gaps', id='fill-gaps-btn', style={'backgroundColor': '#17a2b8', 'color': 'white', 'border': 'none', 'padding': '8px 16px', 'borderRadius': '4px'}),
+            ], style={'display': 'flex', 'alignItems': 'center'}),
+        ], style={'marginTop': 15, 'padding': 15, 'backgroundColor': '#e2e3e5', 'borderRadius': 5}),
+        
     ], style={'marginBottom': 30, 'padding': 20, 'border': '1px solid #ddd', 'borderRadius': 5}),
     
     # Plot area and statistics
     html.Div([
         dcc.Graph(id='interactive-plot', style={'height': '600px'}),
+        # Visible X window of the plot (from relayoutData), drives the level of detail
+        dcc.Store(id='plot-viewport'),
+        # Current markers, written by the marker callbacks so the plot redraws after them
+        dcc.Store(id='marker-store'),
         # Statistics panel
         html.Div([
             html.Div(id='plot-stats', style={
@@ -196,11 +885,38 @@ app.layout = html.Div([
     # Data table
     html.Div([
         html.H3("📊 Filtered Data Preview"),
-        html.Div(id='data-table'),
+        html.H5(id='data-table-title', style={'marginBottom': 10}),
+        # Paging, sorting and the filter row run on the server (update_table); only one page is sent
+        dash_table.DataTable(
+            id='data-table',
+            columns=[],
+            data=[],
+            page_action='custom',
+            page_current=0,
+            page_size=TABLE_PAGE_SIZE,
+            sort_action='custom',
+            sort_mode='multi',
+            sort_by=[],
+            filter_action='custom',
+            filter_query='',
+            # Edited or pasted cells are written back as one edit per change (edit_data)
+            editable=True,
+            style_cell={'textAlign': 'left', 'fontSize': 11, 'padding': '4px'},
+            style_header={'backgroundColor': 'rgb(230, 230, 230)', 'fontWeight': 'bold', 'fontSize': 12},
+            style_data_conditional=[
+                {
+                    'if': {'row_index': 'odd'},
+                    'backgroundColor': 'rgb(248, 248, 248)'
+                }
+            ],
+        ),
     ], style={'marginTop': 30}),
     
-    # Hidden div to store data
-    html.Div(id='data-store', style={'display': 'none'}),
+    # Handle of the server-side dataset (id + edit version), never the data itself
+    dcc.Store(id='data-store'),
+    # Arrow-key presses, and the batched move sent to the server once they pause
+    dcc.Store(id='nudge-keys'),
+    dcc.Store(id='nudge-commit'),
 
     # Keyboard event listener - add this new component
     html.Div(
@@ -221,237 +937,1381 @@ app.layout = html.Div([
     
        # Status
     html.Div(id='status', style={'marginTop': 20, 'padding': 10, 'backgroundColor': '#f0f0f0'}),
-    
-    # Keyboard navigation script
-    html.Script("""
-        document.addEventListener('keydown', function(event) {
-            // Don't interfere when typing in inputs
-            if (document.activeElement.tagName === 'INPUT' || 
-                document.activeElement.tagName === 'TEXTAREA') {
-                return;
-            }
-            
-            // Handle arrow keys for point editing
-            switch(event.key) {
-                case 'ArrowLeft':
-                    event.preventDefault();
-                    const leftBtn = document.getElementById('x-minus-btn');
-                    if (leftBtn) leftBtn.click();
-                    break;
-                case 'ArrowRight':
-                    event.preventDefault();
-                    const rightBtn = document.getElementById('x-plus-btn');
-                    if (rightBtn) rightBtn.click();
-                    break;
-                case 'ArrowDown':
-                    event.preventDefault();
-                    const downBtn = document.getElementById('y-minus-btn');
-                    if (downBtn) downBtn.click();
-                    break;
-                case 'ArrowUp':
-                    event.preventDefault();
-                    const upBtn = document.getElementById('y-plus-btn');
-                    if (upBtn) upBtn.click();
-                    break;
-            }
-        });
-    """)
 ])
 
-def parse_contents(contents, filename):
-    content_type, content_string = contents.split(',')
-    decoded = base64.b64decode(content_string)
+def spool_upload(contents, start):
+    """Base64-decode contents[start:] into a temp file one slice at a time"""
+    tmp = tempfile.NamedTemporaryFile(prefix='charts_edit_upload_', suffix='.dat', delete=False)
+    with tmp:
+        for offset in range(start, len(contents), DECODE_CHUNK_CHARS):
+            tmp.write(base64.b64decode(contents[offset:offset + DECODE_CHUNK_CHARS]))
+    return tmp.name
+
+def read_table_chunked(path, sep, progress=None):
+    """
+    Parse a delimited file in row chunks into a compact frame (see
+    compact_dtypes); returns the frame and the number of chunks. Each chunk
+    is shrunk as soon as it is parsed - low-cardinality text and the text
+    filter columns become Categorical and integers are downcast - so
+    repeated labels are never held as text for the whole file. Float
+    columns become float32 only if no chunk loses digits, and the
+    Categorical chunks are merged with union_categoricals. progress, if
+    given, is called with the rows and bytes parsed so far after each chunk.
+    """
+    chunks, text_dtypes, lossless = [], {}, {}
+    rows = 0
+    with open(path, 'rb') as f:
+        for chunk in pd.read_csv(f, sep=sep, chunksize=PARSE_CHUNK_ROWS):
+            for col in chunk.columns:
+                series = chunk[col]
+                if pd.api.types.is_float_dtype(series):
+                    lossless[col] = lossless.get(col, True) and float32_is_lossless(series.to_numpy())
+                elif pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series):
+                    text_dtypes.setdefault(col, series.dtype)
+            chunks.append(compact_dtypes(chunk, floats=False))
+            rows += len(chunk)
+            if progress is not None:
+                progress(rows, f.tell())
+    if not chunks:
+        return compact_dtypes(pd.read_csv(path, sep=sep)), 0
+    
+    columns = {}
+    for col in chunks[0].columns:
+        parts = [chunk.pop(col) for chunk in chunks]  # release each chunk's column once merged
+        if all(isinstance(part.dtype, pd.CategoricalDtype) for part in parts):
+            merged = pd.Series(union_categoricals(parts), copy=False)
+            if col not in FILTER_COLUMNS and len(merged.cat.categories) > CATEGORY_MAX_RATIO * len(merged):
+                merged = merged.astype(text_dtypes.get(col, object))
+        else:
+            # Free text, or text in only some chunks: merge as text and decide once for the whole column
+            if col in text_dtypes:
+                parts = [part if part.dtype == text_dtypes[col] else part.astype(text_dtypes[col]) for part in parts]
+            merged = pd.concat(parts, ignore_index=True)
+            if pd.api.types.is_float_dtype(merged):
+                # Integer chunks of a column with gaps elsewhere were not checked yet
+                if lossless.get(col) and (all(pd.api.types.is_float_dtype(part) for part in parts)
+                                          or float32_is_lossless(merged.to_numpy())):
+                    merged = merged.astype(np.float32)
+            else:
+                merged = compact_dtypes(merged.to_frame())[col]
+        columns[col] = merged
+    return pd.DataFrame(columns, copy=False), len(chunks)
+
+def sniff_delimiter(sample, filename):
+    """Detect the field delimiter from the first bytes of the file"""
+    text = sample.decode('utf-8', errors='ignore')
+    # Only sniff complete lines
+    if '\n' in text:
+        text = text[:text.rindex('\n')]
+    try:
+        return csv.Sniffer().sniff(text, delimiters='\t,;|').delimiter
+    except csv.Error:
+        return ',' if 'csv' in filename.lower() else '\t'
+
+def printed_values(values):
+    """A float32 array or Series as float64 holding the values it prints as (0.41, not 0.4099999964237213)"""
+    if getattr(values, 'dtype', None) == np.float32:
+        return values.astype(str).astype(np.float64)
+    return values
+
+def float32_is_lossless(values):
+    """True if every value prints the same after a round trip through float32"""
+    as_float32 = values.astype(np.float32)
+    round_trip = as_float32.astype(str).astype(np.float64)
+    return bool(np.array_equal(round_trip, values, equal_nan=True))
+
+def compact_dtypes(df, floats=True):
+    """
+    Shrink the parsed frame: small integer types (at least int16, e.g. DOY),
+    float32 where no digits are lost (unless floats is False), Categorical
+    for species/site/description and other low-cardinality text columns.
+    """
+    for col in df.columns:
+        series = df[col]
+        if pd.api.types.is_bool_dtype(series):
+            continue
+        if pd.api.types.is_integer_dtype(series):
+            for int_type in (np.int16, np.int32):
+                info = np.iinfo(int_type)
+                if len(series) == 0 or (series.min() >= info.min and series.max() <= info.max):
+                    df[col] = series.astype(int_type)
+                    break
+        elif pd.api.types.is_float_dtype(series):
+            if floats and series.dtype != np.float32 and float32_is_lossless(series.to_numpy()):
+                df[col] = series.astype(np.float32)
+        elif pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series):
+            if col in FILTER_COLUMNS or series.nunique() <= CATEGORY_MAX_RATIO * len(series):
+                df[col] = series.astype('category')
+    return df
+
+class RowBuffer:
+    """
+    Append-friendly columnar storage of a session's rows.
+
+    Every column lives in an array with spare capacity at the end (Categorical
+    columns as their integer codes), so added rows are written in place at
+    amortized O(1) cost per row and keep the column's compact dtype. Each row
+    has a stable row ID that is never reused; rows are addressed by ID, and a
+    delete only marks the row dead. frame() is a DataFrame over the live rows,
+    indexed by row ID, viewing the arrays without copying; dead rows are
+    compacted away the next time it is built. Free-text columns (those not
+    made Categorical) are held as object arrays.
+    """
+
+    GROWTH = 1.5
+
+    def __init__(self, df, next_id=0):
+        self.columns = list(df.columns)
+        self.length = len(df)  # used slots, dead rows included
+        self.n_deleted = 0
+        self._data = {}
+        self._categories = {}
+        for col in self.columns:
+            series = df[col]
+            if isinstance(series.dtype, pd.CategoricalDtype):
+                self._categories[col] = series.dtype
+                self._data[col] = series.cat.codes.to_numpy().copy()
+            elif isinstance(series.dtype, np.dtype):
+                self._data[col] = series.to_numpy(copy=True)
+            else:
+                self._data[col] = series.to_numpy(dtype=object, copy=True)
+        # IDs are ascending in slot order, so an ID's slot is found by binary search
+        self._ids = np.arange(self.length, dtype=np.int64)
+        self._live = np.ones(self.length, dtype=bool)
+        self.next_id = max(self.length, next_id)
+        self._frame = None
+        self._text_nbytes = {}  # free-text column -> (slots measured, bytes of their strings)
+
+    def __len__(self):
+        return self.length - self.n_deleted
+
+    def __getstate__(self):
+        # Pickle only the live rows; capacity is regrown on demand
+        self._compact()
+        state = self.__dict__.copy()
+        state['_data'] = {col: values[:self.length] for col, values in self._data.items()}
+        state['_ids'] = self._ids[:self.length]
+        state['_live'] = self._live[:self.length]
+        state['_frame'] = None
+        return state
+
+    @property
+    def capacity(self):
+        return len(self._ids)
+
+    @property
+    def nbytes(self):
+        """
+        Memory held, spare capacity included. The strings of free-text columns
+        are measured once and then only for slots added since the last call
+        (scaled down when deleted rows are compacted away), so sizing a
+        session after an edit is not O(rows).
+        """
+        total = sum(values.nbytes for values in self._arrays())
+        total += sum(int(dtype.categories.memory_usage(deep=True)) for dtype in self._categories.values())
+        for col, values in self._data.items():
+            if values.dtype == object:
+                measured, nbytes = self._text_nbytes.get(col, (0, 0))
+                if measured > self.length:
+                    measured, nbytes = self.length, nbytes * self.length // measured
+                if measured < self.length:
+                    new_values = pd.Series(values[measured:self.length], dtype=object, copy=False)
+                    nbytes += int(new_values.memory_usage(index=False, deep=True)) - new_values.nbytes
+                self._text_nbytes[col] = (self.length, nbytes)
+                total += nbytes
+        return total
+
+    def frame(self):
+        """DataFrame of the live rows indexed by row ID (cached until the layout changes)"""
+        if self._frame is None:
+            self._compact()
+            columns = {}
+            for col in self.columns:
+                values = self._data[col][:self.length]
+                if col in self._categories:
+                    columns[col] = pd.Series(pd.Categorical.from_codes(
+                        values, dtype=self._categories[col], validate=False), copy=False)
+                else:
+                    columns[col] = pd.Series(values, dtype=values.dtype, copy=False)
+            self._frame = pd.DataFrame(columns, columns=self.columns, copy=False)
+            self._frame.index = pd.Index(self._ids[:self.length], copy=False)
+        return self._frame
+
+    def position(self, row_id):
+        """Storage slot of a live row ID; KeyError for unknown or deleted rows"""
+        pos = int(np.searchsorted(self._ids[:self.length], row_id))
+        if pos >= self.length or self._ids[pos] != row_id or not self._live[pos]:
+            raise KeyError(row_id)
+        return pos
+
+    def positions(self, row_ids):
+        """Storage slots of many live row IDs; KeyError if any is unknown or deleted"""
+        row_ids = np.asarray(row_ids, dtype=np.int64)
+        pos = np.searchsorted(self._ids[:self.length], row_ids)
+        found = pos < self.length
+        found[found] = (self._ids[pos[found]] == row_ids[found]) & self._live[pos[found]]
+        if not found.all():
+            raise KeyError(int(row_ids[~found][0]))
+        return pos
+
+    def __contains__(self, row_id):
+        try:
+            self.position(row_id)
+        except KeyError:
+            return False
+        return True
+
+    def set_cell(self, row_id, col, value):
+        """Write one value in place, widening the column's dtype first if needed"""
+        pos = self.position(row_id)
+        self._fit(col, [value])
+        self._data[col][pos] = self._encode(col, [value])[0]
+
+    def set_cells(self, row_ids, col, values):
+        """Write values of one column for many rows in place (vectorized set_cell)"""
+        pos = self.positions(row_ids)
+        self._fit(col, values)
+        self._data[col][pos] = self._encode(col, values)
+
+    def append(self, rows):
+        """Add the rows of a DataFrame at the end; returns their new row IDs"""
+        rows = rows.reindex(columns=self.columns)
+        for col in self.columns:
+            self._fit(col, rows[col])
+        self._reserve(len(rows))
+        end = self.length + len(rows)
+        for col in self.columns:
+            self._data[col][self.length:end] = self._encode(col, rows[col])
+        new_ids = np.arange(self.next_id, self.next_id + len(rows), dtype=np.int64)
+        self._ids[self.length:end] = new_ids
+        self._live[self.length:end] = True
+        self.next_id += len(rows)
+        self.length = end
+        self._frame = None
+        return new_ids
+
+    def delete(self, row_id):
+        """Mark one row as deleted (O(1)); the frame drops it when next built"""
+        self._live[self.position(row_id)] = False
+        self.n_deleted += 1
+        self._frame = None
+
+    def delete_rows(self, row_ids):
+        """Mark many rows as deleted at once (vectorized delete)"""
+        pos = np.unique(self.positions(row_ids))
+        self._live[pos] = False
+        self.n_deleted += len(pos)
+        self._frame = None
+
+    def restore(self, rows):
+        """Put rows (a DataFrame indexed by row ID) back under their IDs, e.g. to undo a delete"""
+        self._compact()
+        rows = rows.reindex(columns=self.columns).sort_index()
+        ids = rows.index.to_numpy(dtype=np.int64)
+        for col in self.columns:
+            self._fit(col, rows[col])
+        encoded = {col: self._encode(col, rows[col]) for col in self.columns}
+        if self.length == 0 or ids[0] > self._ids[self.length - 1]:
+            # IDs past the last row (redo of an add): write at the end
+            self._reserve(len(rows))
+            end = self.length + len(rows)
+            for col in self.columns:
+                self._data[col][self.length:end] = encoded[col]
+            self._ids[self.length:end] = ids
+            self._live[self.length:end] = True
+        else:
+            at = np.searchsorted(self._ids[:self.length], ids)
+            capacity = max(self.capacity, self.length + len(rows))
+            def inserted(values, new_values):
+                out = np.empty(capacity, dtype=values.dtype)
+                out[:self.length + len(rows)] = np.insert(values[:self.length], at, new_values)
+                return out
+            self._data = {col: inserted(values, encoded[col]) for col, values in self._data.items()}
+            self._ids = inserted(self._ids, ids)
+            self._live = inserted(self._live, True)
+        self.length += len(rows)
+        self.next_id = max(self.next_id, int(ids[-1]) + 1) if len(ids) else self.next_id
+        self._frame = None
+
+    def _arrays(self):
+        return [*self._data.values(), self._ids, self._live]
+
+    def _reserve(self, extra):
+        needed = self.length + extra
+        if needed <= self.capacity:
+            return
+        self._resize(max(needed, int(self.capacity * self.GROWTH) + 16))
+
+    def _resize(self, capacity, keep=None):
+        """Move the rows (or only the slots in keep) into fresh arrays of the given capacity"""
+        def moved(values):
+            grown = np.empty(capacity, dtype=values.dtype)
+            if keep is None:
+                grown[:self.length] = values[:self.length]
+            else:
+                grown[:len(keep)] = values[keep]
+            return grown
+        self._data = {col: moved(values) for col, values in self._data.items()}
+        self._ids = moved(self._ids)
+        self._live = moved(self._live)
+        if keep is not None:
+            self.length = len(keep)
+            self.n_deleted = 0
+
+    def _compact(self):
+        # Fresh arrays rather than shifting in place, so frames handed out earlier stay intact
+        if self.n_deleted:
+            self._resize(self.capacity, keep=np.flatnonzero(self._live[:self.length]))
+
+    def _fit(self, col, values):
+        """Widen a column's storage when its dtype cannot hold the new values"""
+        raw_values, values = values, pd.Series(printed_values(values), dtype=object)
+        storage = self._data[col]
+        if col in self._categories:
+            dtype = self._categories[col]
+            unknown = values[(dtype.categories.get_indexer(values) < 0) & values.notna()]
+            if len(unknown) > 0:
+                new_categories = pd.Index(unknown.unique())
+                dtype = pd.CategoricalDtype(dtype.categories.append(new_categories), ordered=dtype.ordered)
+                self._categories[col] = dtype
+                codes_dtype = np.min_scalar_type(-len(dtype.categories))
+                if codes_dtype.itemsize > storage.dtype.itemsize:
+                    self._data[col] = storage.astype(codes_dtype)
+                self._frame = None
+            return
+        if storage.dtype == object or not pd.api.types.is_numeric_dtype(storage.dtype) or \
+                getattr(raw_values, 'dtype', None) == storage.dtype:
+            return
+        new_dtype = None
+        if pd.api.types.is_bool_dtype(storage.dtype):
+            if not all(isinstance(value, (bool, np.bool_)) for value in values):
+                new_dtype = object
+        else:
+            numeric = pd.to_numeric(values, errors='coerce')
+            if (numeric.isna() & values.notna()).any():
+                new_dtype = object
+            elif pd.api.types.is_integer_dtype(storage.dtype):
+                info = np.iinfo(storage.dtype)
+                if numeric.isna().any() or (numeric % 1 != 0).any():
+                    new_dtype = np.float64
+                elif len(numeric) and (numeric.min() < info.min or numeric.max() > info.max):
+                    new_dtype = np.int64
+            elif storage.dtype == np.float32:
+                # Exact float32 values fit as they are; anything else must print the same after
+                # a round trip, e.g. 98765.4321 would become 98765.4296875
+                numbers = numeric.to_numpy(dtype=np.float64)
+                changed = numbers.astype(np.float32).astype(np.float64) != numbers
+                if not float32_is_lossless(numbers[changed & ~np.isnan(numbers)]):
+                    new_dtype = np.float64
+        if new_dtype is not None:
+            # float32 cells keep the values they print as when the column is widened
+            self._data[col] = printed_values(storage).astype(new_dtype)
+            self._frame = None
+
+    def _encode(self, col, values):
+        """Values in the column's storage representation"""
+        if col not in self._categories and getattr(values, 'dtype', None) == self._data[col].dtype:
+            return np.asarray(values)
+        values = pd.Series(printed_values(values), dtype=object)
+        if col in self._categories:
+            return self._categories[col].categories.get_indexer(values)
+        storage = self._data[col]
+        if storage.dtype == object:
+            return values.to_numpy()
+        return values.astype(storage.dtype).to_numpy()
+
+class EditLog:
+    """
+    Undo/redo history of a session's edits, kept as deltas.
+
+    Each entry is one user action: {'op': 'set', 'cells': [(row_id, col, old,
+    new), ...]}, or {'op': 'add'/'delete', 'rows': frame} holding the values
+    of the added or deleted rows, indexed by row ID. Memory grows with the
+    edits rather than with the dataset.
+    """
+
+    def __init__(self):
+        self.done = []
+        self.undone = []
+        self.nbytes = 0  # running total of entry_nbytes over both stacks
+
+    @staticmethod
+    def entry_nbytes(entry):
+        if 'rows' in entry:
+            return int(entry['rows'].memory_usage(index=True, deep=True).sum())
+        return 100 * len(entry['cells'])
+
+    def record(self, entry):
+        self.done.append(entry)
+        self.nbytes += self.entry_nbytes(entry) - sum(self.entry_nbytes(undone) for undone in self.undone)
+        self.undone.clear()
+
+    def undo(self, rows):
+        """Revert the last edit on a RowBuffer; returns the entry, or None if there is none"""
+        if not self.done:
+            return None
+        entry = self.done.pop()
+        apply_edit(rows, entry, reverse=True)
+        self.undone.append(entry)
+        return entry
+
+    def redo(self, rows):
+        """Re-apply the last undone edit; returns the entry, or None if there is none"""
+        if not self.undone:
+            return None
+        entry = self.undone.pop()
+        apply_edit(rows, entry)
+        self.done.append(entry)
+        return entry
+
+    def undo_all(self, rows=None):
+        """Move every edit to the redo stack, reverting them on rows unless it was reloaded already"""
+        while self.done:
+            entry = self.done.pop()
+            if rows is not None:
+                apply_edit(rows, entry, reverse=True)
+            self.undone.append(entry)
+
+def apply_edit(rows, entry, reverse=False):
+    """Apply an EditLog entry to a RowBuffer, or revert it"""
+    op = entry['op']
+    if op == 'set':
+        # One vectorized write per column; a cell listed twice ends at its last value (first when reverting)
+        by_column = {}
+        for row_id, col, old, new in (reversed(entry['cells']) if reverse else entry['cells']):
+            row_ids, values = by_column.setdefault(col, ([], []))
+            row_ids.append(row_id)
+            values.append(old if reverse else new)
+        for col, (row_ids, values) in by_column.items():
+            rows.set_cells(row_ids, col, values)
+    elif (op == 'add') != reverse:
+        rows.restore(entry['rows'])
+    else:
+        rows.delete_rows(entry['rows'].index)
+
+def edit_changes_rows(entry):
+    """Whether an edit adds/removes rows or touches a filter column (see rows_version)"""
+    return entry['op'] != 'set' or any(col in FILTER_COLUMNS for _, col, _, _ in entry['cells'])
+
+def table_changes(data, data_previous):
+    """(row_id, column, value) of the cells that differ between two versions of the table page"""
+    changes = []
+    for record, previous in zip(data or [], data_previous or []):
+        if record.get('id') != previous.get('id'):
+            continue  # page changed underneath the edit
+        for col, value in record.items():
+            if col != 'id' and value != previous.get(col):
+                changes.append((int(record['id']), col, value))
+    return changes
+
+def numeric_table_values(col, values):
+    """Table edits of a numeric column as numbers: blank cells become NaN, other text is rejected"""
+    raw = pd.Series(values, dtype=object)
+    blank = raw.isna() | (raw.astype(str).str.strip() == '')
+    numbers = pd.to_numeric(raw.mask(blank), errors='coerce')
+    bad = numbers.isna() & ~blank
+    if bad.any():
+        raise ValueError(f"{col} takes numbers, not {raw[bad].iloc[0]!r}")
+    return numbers.tolist()
+
+def describe_edit(entry):
+    if entry['op'] == 'set':
+        row_ids = sorted({row_id for row_id, _, _, _ in entry['cells']})
+        return f"edit of point {row_ids[0]}" if len(row_ids) == 1 else f"edit of {len(row_ids)} points"
+    n = len(entry['rows'])
+    noun = f"point {entry['rows'].index[0]}" if n == 1 else f"{n} points"
+    return f"{'adding' if entry['op'] == 'add' else 'removing'} {noun}"
+
+def plain_value(value):
+    """Convert a numpy scalar to the Python value it prints as (float32 0.61 -> 0.61)"""
+    if isinstance(value, np.floating):
+        return float(str(value))
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+def x_step(x_col, step_size):
+    """Step of one X nudge: whole days for DOY and date columns (mirrored in provisional_nudge)"""
+    if x_col == 'DOY' or 'date' in x_col.lower():
+        return 1
+    return step_size
+
+def round_float_noise(values):
+    """Round float arithmetic to 12 significant digits, so 0.43 + 0.02 is 0.45 rather than 0.44999999999999996"""
+    values = np.asarray(values, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        digits = 11 - np.floor(np.log10(np.abs(values)))
+    scale = 10.0 ** np.clip(np.where(np.isfinite(digits), digits, 0), -22, 22)
+    return np.round(values * scale) / scale
+
+def json_float(value):
+    """Float for a JSON payload, None for NaN"""
+    return None if math.isnan(value) else value
+
+def plot_values(series):
+    """Trace coordinates as a plain list, float32 cells as their printed values (as a nudge patch sends them)"""
+    return printed_values(series).tolist()
+
+def display_records(df):
+    """Table records with float32 columns shown as their printed values"""
+    out = df.copy()
+    for col in out.columns:
+        out[col] = printed_values(out[col])
+    return out.to_dict('records')
+
+def content_key(contents):
+    """Hash of an upload payload, used as its cache key"""
+    start = contents.index(',') + 1
+    digest = hashlib.sha256()
+    for offset in range(start, len(contents), DECODE_CHUNK_CHARS):
+        digest.update(contents[offset:offset + DECODE_CHUNK_CHARS].encode('ascii'))
+    return digest.hexdigest()
+
+def load_original(session):
+    """Unedited frame of the current upload from the upload cache (None if not cached)"""
+    return upload_cache.get(session['source_key'])
+
+def edited_row_ids(edit_log):
+    """Row IDs touched by the applied edits (changed cells and added rows)"""
+    ids = []
+    for entry in edit_log.done:
+        if entry['op'] == 'set':
+            ids.append(np.fromiter((cell[0] for cell in entry['cells']), dtype=np.int64, count=len(entry['cells'])))
+        elif entry['op'] == 'add':
+            ids.append(entry['rows'].index.to_numpy(dtype=np.int64))
+    return np.unique(np.concatenate(ids)) if ids else np.empty(0, dtype=np.int64)
+
+def export_frame(session, scope, species_filter, site_filter, description_filter):
+    """Rows to export: everything, or only the filtered and/or edited ones"""
+    df = session['df']
+    if 'filtered' in scope:
+        df = get_filtered_view(session, species_filter, site_filter, description_filter)
+    if 'changed' in scope:
+        df = df[df.index.isin(edited_row_ids(session['edit_log']))]
+    return df
+
+def export_error(fmt, compression):
+    """Why an export format/compression pair can't be written here, or None"""
+    if fmt not in EXPORT_FORMATS or compression not in EXPORT_COMPRESSION_SUFFIXES:
+        return "Unknown export format"
+    if fmt in ('parquet', 'feather') and pa is None:
+        return f"{fmt.capitalize()} export needs pyarrow"
+    if fmt == 'feather' and compression == 'gzip':
+        return "Feather files support zstd compression only"
+    if fmt in ('tsv', 'csv', 'patch') and compression == 'zstd' and zstandard is None:
+        return "zstd compression needs the zstandard package"
+    return None
+
+class ChunkSink(io.RawIOBase):
+    """Write-only file object whose buffered bytes are taken out with drain()"""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+def compress_stream(pieces, compression):
+    """Compress an iterable of byte strings as one gzip or zstd stream (or pass it through)"""
+    if compression == 'none':
+        yield from pieces
+        return
+    compressor = zlib.compressobj(wbits=31) if compression == 'gzip' else zstandard.ZstdCompressor().compressobj()
+    for data in pieces:
+        data = compressor.compress(data)
+        if data:
+            yield data
+    yield compressor.flush()
+
+def decompress_upload(data):
+    """Bytes of an uploaded file, gunzipped or zstd-decoded when it starts with their magic number"""
+    if data[:2] == b'\x1f\x8b':
+        return zlib.decompress(data, wbits=31)
+    if data[:4] == b'\x28\xb5\x2f\xfd':
+        if zstandard is None:
+            raise ValueError("zstd-compressed files need the zstandard package")
+        return zstandard.ZstdDecompressor().stream_reader(io.BytesIO(data)).read()
+    return data
+
+def original_frame(session):
+    """
+    The session's upload before any edits, indexed by row ID: the cached
+    upload if there is one, otherwise a copy of the rows with every applied
+    edit reverted.
+    """
+    original = load_original(session)
+    if original is not None:
+        return original
+    rows = pickle.loads(pickle.dumps(session['rows'], protocol=pickle.HIGHEST_PROTOCOL))
+    for entry in reversed(session['edit_log'].done):
+        apply_edit(rows, entry, reverse=True)
+    return rows.frame()
+
+def values_differ(old, new):
+    """Element-wise old != new of two aligned Series, counting two missing values as equal"""
+    if pd.api.types.is_numeric_dtype(old) and pd.api.types.is_numeric_dtype(new):
+        old = old.to_numpy(dtype=np.float64, na_value=np.nan)
+        new = new.to_numpy(dtype=np.float64, na_value=np.nan)
+        return (old != new) & ~(np.isnan(old) & np.isnan(new))
+    old, new = old.to_numpy(dtype=object), new.to_numpy(dtype=object)
+    return ~((old == new) | (pd.isna(old) & pd.isna(new)))
+
+def diff_frames(original, df, source_key):
+    """
+    Patch turning original into df, rows matched by row ID: the removed row
+    IDs, the changed cells of each column and the added rows, as plain
+    Python values ready for JSON.
+    """
+    original_ids = original.index.to_numpy()
+    kept = df.index.isin(original_ids)
+    common = df.index[kept]
+    before, after = original.loc[common], df[kept]
+    modified = {}
+    for col in df.columns:
+        changed = values_differ(before[col], after[col])
+        if changed.any():
+            modified[col] = {'ids': common[changed].tolist(),
+                             'values': [plain_value(value) for value in after[col].to_numpy()[changed]]}
+    added = df[~kept]
+    return {
+        'format': 'charts-edit-patch', 'version': 1,
+        'source_key': source_key, 'source_rows': len(original), 'columns': list(original.columns),
+        'removed': original_ids[~np.isin(original_ids, df.index.to_numpy())].tolist(),
+        'modified': modified,
+        'added': {'ids': added.index.tolist(),
+                  'values': {col: [plain_value(value) for value in added[col].to_numpy()] for col in added.columns}},
+    }
+
+def patch_edits(original, patch):
+    """EditLog entries (delete, set, add) that apply a patch to the unedited frame it was made from"""
+    if patch.get('format') != 'charts-edit-patch':
+        raise ValueError("not a patch file")
+    if patch['columns'] != list(original.columns) or patch['source_rows'] != len(original):
+        raise ValueError("the patch was made from a different file")
+    entries = []
+    removed = np.asarray(patch['removed'], dtype=np.int64)
+    if len(removed):
+        entries.append({'op': 'delete', 'rows': original.loc[removed]})
+    cells = []
+    for col, change in patch['modified'].items():
+        old = [plain_value(value) for value in original[col].loc[change['ids']].to_numpy()]
+        cells.extend(zip(change['ids'], [col] * len(old), old, change['values']))
+    if cells:
+        entries.append({'op': 'set', 'cells': cells})
+    added = patch['added']
+    if added['ids']:
+        if min(added['ids']) < len(original):
+            raise ValueError("added rows reuse IDs of the source file")
+        entries.append({'op': 'add', 'rows': pd.DataFrame(added['values'], index=added['ids'])})
+    return entries
+
+def export_schema(df):
+    """
+    Arrow schema shared by every slice of an export. It is inferred from
+    the empty frame, where free-text (object) columns come out as type
+    null, so those are declared as strings.
+    """
+    schema = pa.Schema.from_pandas(df.iloc[:0], preserve_index=False)
+    for i, field in enumerate(schema):
+        if pa.types.is_null(field.type):
+            schema = schema.set(i, field.with_type(pa.string()))
+    return schema
+
+def export_chunks(df, fmt, compression):
+    """
+    Encode df in EXPORT_CHUNK_ROWS slices, yielding bytes as they are ready,
+    so an export never holds more than one encoded slice. Parquet writes a
+    row group per slice and Feather a record batch, both compressed by the
+    format itself; text is compressed as a stream.
+    """
+    starts = range(0, len(df), EXPORT_CHUNK_ROWS)
+    if fmt in ('tsv', 'csv'):
+        sep = '\t' if fmt == 'tsv' else ','
+        yield from compress_stream((df.iloc[start:start + EXPORT_CHUNK_ROWS].to_csv(sep=sep, index=False, header=start == 0)
+                                    .encode('utf-8') for start in (starts if len(df) else [0])), compression)
+        return
+    
+    sink = ChunkSink()
+    schema = export_schema(df)
+    codec = None if compression == 'none' else compression
+    if fmt == 'parquet':
+        writer = pq.ParquetWriter(sink, schema, compression=codec or 'none')
+    else:
+        writer = pa.ipc.new_file(sink, schema, options=pa.ipc.IpcWriteOptions(compression=codec))
+    with writer:
+        for start in starts:
+            writer.write_table(pa.Table.from_pandas(df.iloc[start:start + EXPORT_CHUNK_ROWS], schema=schema,
+                                                    preserve_index=False))
+            yield sink.drain()
+    yield sink.drain()
+
+def parse_contents(contents, filename, progress=None):
+    # progress, if given, is called with a status line while a large upload is parsed
+    # Skip the "data:<type>;base64," header without copying the payload
+    start = contents.index(',') + 1
+    payload_bytes = (len(contents) - start) * 3 // 4
     
     try:
-        if 'csv' in filename:
-            df = pd.read_csv(io.StringIO(decoded.decode('utf-8')))
+        if payload_bytes > STREAM_THRESHOLD_BYTES:
+            # Large trace exports: never hold the decoded bytes, a str copy and a StringIO at once
+            if progress is not None:
+                progress(f"⏳ Decoding {payload_bytes / 1e6:.1f} MB upload...")
+            path = spool_upload(contents, start)
+            try:
+                with open(path, 'rb') as f:
+                    sep = sniff_delimiter(f.read(SNIFF_BYTES), filename)
+                report = None
+                if progress is not None:
+                    def report(rows, parsed_bytes):
+                        progress(f"⏳ Parsed {rows:,} rows ({parsed_bytes / 1e6:.1f} of {payload_bytes / 1e6:.1f} MB)")
+                df, n_chunks = read_table_chunked(path, sep, report)
+            finally:
+                os.remove(path)
+            progress = f" (streamed {payload_bytes / 1e6:.1f} MB in {n_chunks} chunks)"
         else:
-            # Try tab-separated first
-            df = pd.read_csv(io.StringIO(decoded.decode('utf-8')), sep='\t')
+            # pandas parses UTF-8 bytes directly, no intermediate str
+            decoded = base64.b64decode(contents[start:])
+            sep = sniff_delimiter(decoded[:SNIFF_BYTES], filename)
+            df = compact_dtypes(pd.read_csv(io.BytesIO(decoded), sep=sep))
+            progress = ""
     except Exception as e:
         return None, f"Error reading file: {str(e)}"
     
-    return df, f"Successfully loaded {len(df)} rows and {len(df.columns)} columns"
+    return df, f"Successfully loaded {len(df)} rows and {len(df.columns)} columns{progress}"
+
+def round_decimals(values):
+    """Round values with a decimal part to 2 places, leaving whole numbers as they are"""
+    values = np.asarray(values, dtype=np.float64)
+    whole = np.round(values)
+    return np.where(np.abs(values - whole) < 1e-10, whole, np.round(values, 2))
 
-def create_interpolated_row(df, new_x, x_col, y_col, new_y, species_filter=None, site_filter=None):
+def interpolation_order(df, x_col, species_filter=None, site_filter=None, index=None):
     """
-    Create a new row with interpolated values for all parameters.
-    Respects current filters and rounds decimal values to 2 places.
+    Positions of the rows new points are interpolated from, sorted by X: the
+    single selected species/site when it has rows, otherwise every row.
+    Pass a FilterIndex built for df to skip the column scans.
     """
-    import numpy as np
-    
-    def round_if_decimal(value):
-        """Round numeric values to 2 decimal places if they have decimal part"""
-        try:
-            if pd.isna(value):
-                return value
-            if isinstance(value, (int, float)) and not isinstance(value, bool):
-                # Check if it's effectively an integer
-                if abs(value - round(value)) < 1e-10:
-                    return int(round(value))
-                else:
-                    return round(float(value), 2)
-            return value
-        except (TypeError, ValueError):
-            return value
-    
-    # Apply filters to get relevant data for interpolation
-    working_df = df.copy()
-    original_len = len(working_df)
-    
-    # Filter by species if specified
-    if species_filter and len(species_filter) == 1:
-        species_data = working_df[working_df['Sc'] == species_filter[0]]
-        if len(species_data) > 0:
-            working_df = species_data
-    
-    # Filter by site if specified  
-    if site_filter and len(site_filter) == 1:
-        site_data = working_df[working_df['SiteC'] == site_filter[0]]
-        if len(site_data) > 0:
-            working_df = site_data
-    
-    # Handle edge cases
-    if len(working_df) == 0:
-        # Create basic row with filter values
-        new_row = pd.Series(dtype=object)
-        new_row[x_col] = new_x
-        new_row[y_col] = round_if_decimal(new_y)
-        
-        # Set categorical values from filters
-        if species_filter and len(species_filter) == 1:
-            new_row['Sc'] = species_filter[0]
-        if site_filter and len(site_filter) == 1:
-            new_row['SiteC'] = site_filter[0]
-            
-        # Set default values for other common columns
+    rows, applied = None, []  # None: every row
+    for col, values in (('Sc', species_filter), ('SiteC', site_filter)):
+        if not values or len(values) != 1 or col not in df.columns:
+            continue
+        if index is not None:
+            group = index.rows(applied + [(col, values)])
+        else:
+            candidates = np.arange(len(df)) if rows is None else rows
+            group = candidates[(df[col].iloc[candidates] == values[0]).to_numpy()]
+        if len(group) > 0:
+            rows = group
+            applied.append((col, values))
+    if rows is None:
+        rows = np.arange(len(df))
+    x = pd.to_numeric(df[x_col].iloc[rows], errors='coerce').to_numpy(dtype=np.float64)
+    return rows[np.argsort(x, kind='stable')]
+
+def interpolate_rows(df, new_x, new_y, x_col, y_col, order, fixed=None):
+    """
+    Build interpolated rows for arrays of new X and Y values in one pass.
+
+    order holds the positions of the rows to draw from, sorted by X (see
+    interpolation_order). Numeric columns are blended linearly between the two
+    neighbouring rows, keeping the lower neighbour's value where either side is
+    NaN; outside the X range the first/last row is copied. Other columns take
+    the value of the nearest neighbour. With new_y None the Y column is
+    interpolated too. fixed maps columns to a value set on every new row.
+    Numeric values are rounded to 2 decimal places.
+    """
+    new_x = np.atleast_1d(np.asarray(new_x, dtype=np.float64))
+    n_new = len(new_x)
+    numeric_columns = set(df.select_dtypes(include=[np.number]).columns)
+    out = {}
+
+    if len(order) == 0:
+        # Nothing to interpolate from: medians for numeric columns, '-' for the rest
         for col in df.columns:
-            if col not in [x_col, y_col, 'Sc', 'SiteC'] and col not in new_row:
-                if df[col].dtype in ['object', 'string']:
-                    new_row[col] = '-'  # Default categorical value
-                else:
-                    new_row[col] = round_if_decimal(df[col].median())  # Use median for numeric
-        
-        return new_row
-    
-    if len(working_df) == 1:
-        new_row = working_df.iloc[0].copy()
-        new_row[x_col] = new_x  
-        new_row[y_col] = round_if_decimal(new_y)
-        return new_row
-    
-    # Sort for interpolation
-    df_sorted = working_df.sort_values(x_col).reset_index(drop=True)
-    x_values = df_sorted[x_col].values
-    
-    # Determine interpolation strategy
-    if new_x <= x_values[0]:
-        # Extrapolate from first point
-        new_row = df_sorted.iloc[0].copy()
-        interp_type = "extrapolated_before"
-    elif new_x >= x_values[-1]:
-        # Extrapolate from last point
-        new_row = df_sorted.iloc[-1].copy()  
-        interp_type = "extrapolated_after"
+            if col in numeric_columns:
+                out[col] = np.full(n_new, df[col].median(), dtype=np.float64)
+            else:
+                out[col] = np.full(n_new, '-', dtype=object)
     else:
-        # Interpolate between points
-        try:
-            idx_after = np.searchsorted(x_values, new_x)
-            idx_before = max(0, idx_after - 1)
-            idx_after = min(len(df_sorted) - 1, idx_after)
-            
-            x_before = x_values[idx_before]
-            x_after = x_values[idx_after]
-            
-            if abs(x_after - x_before) < 1e-10:
-                # Points are essentially at same X value
-                new_row = df_sorted.iloc[idx_before].copy()
-                interp_type = "duplicated_x"
+        x = pd.to_numeric(df[x_col].iloc[order], errors='coerce').to_numpy(dtype=np.float64)
+        past_end = (new_x >= x[-1]) & (new_x > x[0])
+        after = np.minimum(np.maximum(np.searchsorted(x, new_x, side='left'), 1), len(x) - 1)
+        after[past_end] = len(x) - 1
+        before = np.maximum(after - 1, 0)
+        span = x[after] - x[before]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            weight = np.where(np.abs(span) > 1e-10, (new_x - x[before]) / span, 0.0)
+        weight = np.clip(weight, 0.0, 1.0)
+        weight[past_end] = 1.0
+
+        # Read only the neighbour rows, once, instead of whole columns
+        needed, inverse = np.unique(np.concatenate([order[before], order[after]]), return_inverse=True)
+        neighbours = df.iloc[needed]
+        lower, upper = inverse[:n_new], inverse[n_new:]
+        copied = np.where(past_end, upper, lower)
+        nearest = np.where(weight < 0.5, lower, upper)
+
+        for col in df.columns:
+            if col in numeric_columns:
+                values = neighbours[col].to_numpy(dtype=np.float64, na_value=np.nan)
+                blended = np.where(weight >= 1.0, values[upper],
+                                   values[lower] + weight * (values[upper] - values[lower]))
+                out[col] = np.where(np.isnan(values[lower]) | np.isnan(values[upper]), values[copied], blended)
             else:
-                # Linear interpolation
-                weight = (new_x - x_before) / (x_after - x_before)
-                new_row = df_sorted.iloc[idx_before].copy()
-                
-                # Get all numeric columns for interpolation
-                numeric_columns = df_sorted.select_dtypes(include=[np.number]).columns
-                
-                for col in numeric_columns:
-                    if col != x_col:  # Don't interpolate X column
-                        try:
-                            value_before = df_sorted.iloc[idx_before][col]
-                            value_after = df_sorted.iloc[idx_after][col]
-                            
-                            # Skip NaN values
-                            if pd.isna(value_before) or pd.isna(value_after):
-                                continue
-                            
-                            # Linear interpolation with rounding
-                            interpolated = value_before + weight * (value_after - value_before)
-                            new_row[col] = round_if_decimal(interpolated)
-                            
-                        except (KeyError, TypeError, ValueError):
-                            continue
-                
-                # Handle categorical columns (take from closest point)
-                categorical_columns = df_sorted.select_dtypes(exclude=[np.number]).columns
-                for col in categorical_columns:
-                    if col not in [x_col, y_col]:
-                        try:
-                            if weight < 0.5:
-                                new_row[col] = df_sorted.iloc[idx_before][col]
-                            else:
-                                new_row[col] = df_sorted.iloc[idx_after][col]
-                        except (KeyError, TypeError):
-                            continue
-                
-                interp_type = "interpolated"
-                
-        except Exception as e:
-            # Fallback to nearest point
-            new_row = df_sorted.iloc[0].copy()
-            interp_type = "fallback"
-    
-    # Set final X and Y values with rounding
-    new_row[x_col] = new_x  # X is usually DOY (integer)
-    new_row[y_col] = round_if_decimal(new_y)
-    
-    # Override with single filter values if specified
+                out[col] = neighbours[col].to_numpy(dtype=object)[nearest]
+
+    out[x_col] = new_x
+    if new_y is not None:
+        out[y_col] = np.atleast_1d(np.asarray(new_y, dtype=np.float64))
+    for col, value in (fixed or {}).items():
+        if col in out:
+            out[col] = np.full(n_new, value, dtype=object)
+    for col in numeric_columns:
+        out[col] = round_decimals(out[col])
+    return pd.DataFrame(out, columns=df.columns)
+
+def single_filter_values(species_filter=None, site_filter=None):
+    """Sc/SiteC values new rows inherit from a single-value species/site filter"""
+    fixed = {}
     if species_filter and len(species_filter) == 1:
-        new_row['Sc'] = species_filter[0]
+        fixed['Sc'] = species_filter[0]
     if site_filter and len(site_filter) == 1:
-        new_row['SiteC'] = site_filter[0]
-    
-    # Apply rounding to all numeric columns in final row
-    for col in new_row.index:
-        try:
-            if col in df.select_dtypes(include=[np.number]).columns:
-                new_row[col] = round_if_decimal(new_row[col])
-        except (KeyError, TypeError):
+        fixed['SiteC'] = site_filter[0]
+    return fixed
+
+def create_interpolated_row(df, new_x, x_col, y_col, new_y, species_filter=None, site_filter=None, order=None):
+    """
+    Create a new row with interpolated values for all parameters.
+    Respects current filters and rounds decimal values to 2 places.
+    order may pass a cached interpolation_order for the same filters.
+    """
+    if order is None:
+        order = interpolation_order(df, x_col, species_filter, site_filter)
+    rows = interpolate_rows(df, [new_x], [new_y], x_col, y_col, order,
+                            single_filter_values(species_filter, site_filter))
+    return rows.iloc[0]
+
+class FilterIndex:
+    """
+    Row positions of every Sc/SiteC/Description value.
+
+    Built once per row layout of a dataset (see rows_version), so filter
+    combinations resolve with sorted-array unions and intersections instead
+    of scanning the columns on every callback.
+    """
+
+    def __init__(self, df):
+        self.positions = {}
+        for col in FILTER_COLUMNS:
+            if col not in df.columns:
+                continue
+            codes, uniques = pd.factorize(df[col])
+            order = np.argsort(codes, kind='stable')
+            bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+            self.positions[col] = {value: order[bounds[i]:bounds[i + 1]] for i, value in enumerate(uniques)}
+
+    def rows(self, filters):
+        """Sorted row positions matching all (column, values) filters, or None for every row"""
+        result = None
+        for col, values in filters:
+            if not values:
+                continue
+            by_value = self.positions.get(col, {})
+            parts = [by_value[value] for value in dict.fromkeys(values) if value in by_value]
+            if len(parts) == 1:
+                selected = parts[0]  # buckets are sorted already
+            elif parts:
+                selected = np.sort(np.concatenate(parts))  # buckets of different values never overlap
+            else:
+                selected = np.empty(0, dtype=np.intp)
+            result = selected if result is None else sorted_intersection(result, selected)
+        return result
+
+
+def sorted_intersection(a, b):
+    """Values in both sorted, duplicate-free arrays: a binary search of the shorter one in the longer"""
+    if len(a) > len(b):
+        a, b = b, a
+    if len(a) == 0:
+        return a
+    found = np.minimum(np.searchsorted(b, a), len(b) - 1)
+    return a[b[found] == a]
+
+
+class LRUCache:
+    """Small thread-safe memo table for derived data keyed by dataset id and version"""
+
+    def __init__(self, max_items):
+        self.max_items = max_items
+        self._items = OrderedDict()
+        self._guard = threading.Lock()
+
+    def get(self, key):
+        with self._guard:
+            if key in self._items:
+                self._items.move_to_end(key)
+                return self._items[key]
+            return None
+
+    def put(self, key, value):
+        with self._guard:
+            self._store(key, value)
+
+    def get_or_build(self, key, build):
+        with self._guard:
+            if key in self._items:
+                self._items.move_to_end(key)
+                return self._items[key]
+        # Build outside the lock; two callbacks may race to build the same entry
+        value = build()
+        with self._guard:
+            self._store(key, value)
+        return value
+
+    def _store(self, key, value):
+        # Called with _guard held
+        self._items[key] = value
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_items:
+            self._items.popitem(last=False)
+
+
+class ViewCache(LRUCache):
+    """
+    LRUCache of views keyed by (kind, dataset_id, version, ...). Every edit
+    bumps the version, so storing a view of a newer version drops all views
+    of older versions of that dataset instead of letting superseded copies
+    of the frame fill the cache.
+    """
+
+    def _store(self, key, value):
+        dataset_id, version = key[1], key[2]
+        stale = []
+        for other in self._items:
+            if other[1] == dataset_id:
+                if other[2] > version:
+                    return  # built from a version another callback has already moved past
+                if other[2] < version:
+                    stale.append(other)
+        for other in stale:
+            del self._items[other]
+        super()._store(key, value)
+
+
+class RunningStats:
+    """
+    Count/mean/std/min/max of a column, computed once with numpy and then
+    kept up to date across edits: Welford updates (and their inverse for
+    removals) for mean/std, and the running extremes for min/max. Every add
+    or remove is O(1) and holds no per-value state; removing the current
+    minimum or maximum clears `exact`, after which the owner rebuilds the
+    stats. NaN values are ignored like pandas does.
+    """
+
+    def __init__(self, values):
+        values = pd.to_numeric(pd.Series(values), errors='coerce').to_numpy(dtype=np.float64)
+        values = values[~np.isnan(values)]
+        self.count = len(values)
+        self.mean_value = float(values.mean()) if self.count else 0.0
+        self.m2 = float(((values - self.mean_value) ** 2).sum()) if self.count else 0.0
+        self.min_value = float(values.min()) if self.count else math.nan
+        self.max_value = float(values.max()) if self.count else math.nan
+        self.exact = True
+
+    def add(self, value):
+        if value is None or math.isnan(value):
+            return
+        self.count += 1
+        delta = value - self.mean_value
+        self.mean_value += delta / self.count
+        self.m2 += delta * (value - self.mean_value)
+        self.min_value = value if self.count == 1 else min(self.min_value, value)
+        self.max_value = value if self.count == 1 else max(self.max_value, value)
+
+    def remove(self, value):
+        if value is None or math.isnan(value) or self.count == 0:
+            return
+        if self.count == 1:
+            self.count, self.mean_value, self.m2 = 0, 0.0, 0.0
+            self.min_value = self.max_value = math.nan
+            return
+        old_mean = self.mean_value
+        self.count -= 1
+        self.mean_value = (old_mean * (self.count + 1) - value) / self.count
+        self.m2 = max(self.m2 - (value - old_mean) * (value - self.mean_value), 0.0)
+        if value <= self.min_value or value >= self.max_value:
+            self.exact = False  # the next extreme is not tracked
+
+    def replace(self, old_value, new_value):
+        self.remove(old_value)
+        self.add(new_value)
+
+    @property
+    def mean(self):
+        return self.mean_value if self.count else math.nan
+
+    @property
+    def std(self):
+        # Sample standard deviation, matching Series.std()
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else math.nan
+
+    @property
+    def min(self):
+        return self.min_value
+
+    @property
+    def max(self):
+        return self.max_value
+
+
+filter_indexes = LRUCache(FILTER_INDEX_CACHE_SIZE)
+view_cache = ViewCache(VIEW_CACHE_SIZE)
+running_stats = LRUCache(VIEW_CACHE_SIZE)
+figure_maps = LRUCache(FIGURE_MAP_CACHE_SIZE)
+upload_progress = {}  # session ID -> status line of the upload being parsed
+
+def get_filter_index(session):
+    """FilterIndex of the session's dataset, rebuilt only when its rows change"""
+    key = (session['dataset_id'], session['rows_version'])
+    return filter_indexes.get_or_build(key, lambda: FilterIndex(session['df']))
+
+def apply_filters(df, species_filter, site_filter, description_filter, index=None):
+    """
+    Apply selected filters to the dataframe.
+    With no active filter the frame itself is returned; pass a FilterIndex
+    built for df to skip the column scans.
+    """
+    filters = [('Sc', species_filter), ('SiteC', site_filter), ('Description', description_filter)]
+    if not any(values for _, values in filters):
+        return df
+    
+    if index is not None:
+        return df.iloc[index.rows(filters)]
+    
+    mask = np.ones(len(df), dtype=bool)
+    for col, values in filters:
+        if values:
+            mask &= df[col].isin(values).to_numpy()
+    return df[mask]
+
+def filters_key(species_filter, site_filter, description_filter):
+    return (tuple(species_filter or []), tuple(site_filter or []), tuple(description_filter or []))
+
+def get_filtered_view(session, species_filter, site_filter, description_filter):
+    """Filtered frame of the session's current dataset version (memoized)"""
+    key = ('filtered', session['dataset_id'], session['version'],
+           filters_key(species_filter, site_filter, description_filter))
+    return view_cache.get_or_build(key, lambda: apply_filters(
+        session['df'], species_filter, site_filter, description_filter, get_filter_index(session)))
+
+def get_interpolation_order(session, x_col, species_filter=None, site_filter=None):
+    """interpolation_order of the session's current dataset version (memoized)"""
+    key = ('interpolation', session['dataset_id'], session['version'], x_col,
+           filters_key(species_filter, site_filter, None))
+    return view_cache.get_or_build(key, lambda: interpolation_order(
+        session['df'], x_col, species_filter, site_filter, get_filter_index(session)))
+
+def fill_gaps(session, x_col, y_col, step, species_filter, site_filter, description_filter):
+    """
+    Interpolated rows for every X value missing from each Sc/SiteC group of the
+    current filters, on a grid of the given step from the group's first to
+    last X. Returns the new rows and a list of ((species, site), rows added).
+    """
+    groups = get_filtered_view(session, species_filter, site_filter, description_filter)[['Sc', 'SiteC']]
+    # Rows without a species or site belong to no group the filter index can resolve
+    groups = groups.dropna().drop_duplicates().sort_values(['Sc', 'SiteC']).itertuples(index=False)
+    df = session['df']
+    x_all = pd.to_numeric(df[x_col], errors='coerce').to_numpy(dtype=np.float64)
+    
+    # One sort by (group, X) holds every group's interpolation_order as a slice
+    species_codes, species_values = pd.factorize(df['Sc'])
+    site_codes, site_values = pd.factorize(df['SiteC'])
+    group_codes = species_codes.astype(np.int64) * (len(site_values) + 1) + site_codes
+    order_all = np.lexsort((x_all, group_codes))
+    sorted_codes = group_codes[order_all]
+    species_lookup = {value: code for code, value in enumerate(species_values)}
+    site_lookup = {value: code for code, value in enumerate(site_values)}
+    
+    new_rows, counts, total = [], [], 0
+    for species, site in groups:
+        code = species_lookup[species] * (len(site_values) + 1) + site_lookup[site]
+        start, end = np.searchsorted(sorted_codes, [code, code + 1])
+        order = order_all[start:end]
+        x = x_all[order]
+        x = x[~np.isnan(x)]
+        if len(x) < 2:
+            counts.append(((species, site), 0))
             continue
-    
-    return new_row
+        grid = x[0] + step * np.arange(int(np.floor((x[-1] - x[0]) / step + 1e-9)) + 1)
+        missing = grid[~np.isin(np.round(grid, 6), np.round(x, 6))]
+        total += len(missing)
+        if total > GAP_FILL_MAX_ROWS:
+            raise ValueError(f"more than {GAP_FILL_MAX_ROWS} rows to add, use a larger step")
+        if len(missing) > 0:
+            new_rows.append(interpolate_rows(df, missing, None, x_col, y_col, order,
+                                             {'Sc': species, 'SiteC': site}))
+        counts.append(((species, site), len(missing)))
+    
+    rows = pd.concat(new_rows, ignore_index=True) if new_rows else df.iloc[:0]
+    return rows, counts
 
-def apply_filters(df, species_filter, site_filter, description_filter):
-    """Apply selected filters to the dataframe"""
-    filtered_df = df.copy()
-    
-    if species_filter:
-        filtered_df = filtered_df[filtered_df['Sc'].isin(species_filter)]
-    
-    if site_filter:
-        filtered_df = filtered_df[filtered_df['SiteC'].isin(site_filter)]
-    
-    if description_filter:
-        filtered_df = filtered_df[filtered_df['Description'].isin(description_filter)]
+def get_running_stats(session, species_filter, site_filter, description_filter, y_col, filtered_df):
+    """RunningStats of the filter group, rebuilt only if it was not kept up to date by the edits"""
+    key = (session['dataset_id'], filters_key(species_filter, site_filter, description_filter), y_col)
+    entry = running_stats.get(key)
+    if entry is None or entry['version'] != session['version']:
+        entry = {'version': session['version'], 'stats': RunningStats(filtered_df[y_col])}
+        running_stats.put(key, entry)
+    return entry['stats']
+
+def advance_running_stats(session, old_version, species_filter, site_filter, description_filter, y_col, changes):
+    """
+    Carry the filter group's RunningStats over an edit from old_version to the
+    session's current version. changes holds (old_y, new_y) pairs for rows of
+    the group, with None for added/removed rows; pass None when group
+    membership itself may have changed, so the stats are rebuilt instead.
+    """
+    key = (session['dataset_id'], filters_key(species_filter, site_filter, description_filter), y_col)
+    entry = running_stats.get(key)
+    if entry is None or entry['version'] != old_version or changes is None:
+        return
+    for old_value, new_value in changes:
+        if old_value is not None:
+            entry['stats'].remove(old_value)
+        if new_value is not None:
+            entry['stats'].add(new_value)
+    if not entry['stats'].exact:
+        # The group's minimum or maximum moved inward: recount the new version with numpy
+        entry['stats'] = RunningStats(get_filtered_view(session, species_filter, site_filter, description_filter)[y_col])
+    entry['version'] = session['version']
+
+def row_in_filters(df, row_id, species_filter, site_filter, description_filter):
+    """Whether one row passes the current filters"""
+    for col, values in (('Sc', species_filter), ('SiteC', site_filter), ('Description', description_filter)):
+        if values and df.at[row_id, col] not in values:
+            return False
+    return True
+
+def numeric_cell(df, row_id, col):
+    """Stored value of one cell as a float (NaN if not numeric)"""
+    try:
+        return float(df.at[row_id, col])
+    except (TypeError, ValueError):
+        return math.nan
+
+def get_plot_view(session, species_filter, site_filter, description_filter, x_col, y_col):
+    """
+    Filtered frame, X-sorted frame and Y statistics for one dataset version.
+    Shared by the plot, the stats panel and the table; any edit bumps the
+    version, so marker or table-only interactions never recompute them.
+    """
+    key = ('plot', session['dataset_id'], session['version'],
+           filters_key(species_filter, site_filter, description_filter), x_col, y_col)
+    
+    def build():
+        filtered_df = get_filtered_view(session, species_filter, site_filter, description_filter)
+        y_stats = get_running_stats(session, species_filter, site_filter, description_filter, y_col, filtered_df)
+        return {
+            'filtered': filtered_df,
+            'sorted': filtered_df.sort_values(x_col, kind='stable'),  # index keeps the row IDs; ties in row order
+            'mean': y_stats.mean,
+            'std': y_stats.std,
+            'min': y_stats.min,
+            'max': y_stats.max,
+            'x_min': filtered_df[x_col].min(),
+            'x_max': filtered_df[x_col].max(),
+        }
     
-    return filtered_df
+    return view_cache.get_or_build(key, build)
 
-def display_current_markers():
-    if not data_store['markers']:
+# Filter row operators of the table, longest first; an 's'/'i' prefix marks case (in)sensitive
+TABLE_FILTER_OPERATORS = {'>=': 'ge', '<=': 'le', '!=': 'ne', '>': 'gt', '<': 'lt', '=': 'eq',
+                          'ge': 'ge', 'le': 'le', 'ne': 'ne', 'gt': 'gt', 'lt': 'lt', 'eq': 'eq',
+                          'contains': 'contains', 'datestartswith': 'datestartswith'}
+TABLE_FILTER_PART = re.compile(r"\{(?P<col>[^}]+)\}\s*(?P<case>[si]?)(?P<op>%s)\s*(?P<value>.*)" % '|'.join(
+    re.escape(op) for op in sorted(TABLE_FILTER_OPERATORS, key=len, reverse=True)))
+# Unary operators ("is blank", "is not num", ...); the value slot of the term holds the "not"
+TABLE_FILTER_UNARY_OPERATORS = ('blank', 'nil', 'num', 'str', 'bool', 'even', 'odd', 'object')
+TABLE_FILTER_UNARY = re.compile(r"\{(?P<col>[^}]+)\}\s*is\s+(?P<negate>not\s+)?(?P<op>%s)$" % '|'.join(
+    TABLE_FILTER_UNARY_OPERATORS))
+
+def parse_table_filter(filter_query):
+    """
+    (column, operator, value, case_sensitive) terms of a DataTable filter_query
+    joined by &&. value is the operand text, unquoted; table_filter_mask reads
+    it as a number only to compare it with a numeric column. A term that does
+    not parse becomes (None, 'none', ...), which matches no rows, rather than
+    being dropped from the filter.
+    """
+    terms = []
+    for part in (filter_query or '').split(' && '):
+        part = part.strip()
+        if not part:
+            continue
+        unary = TABLE_FILTER_UNARY.match(part)
+        if unary:
+            terms.append((unary.group('col'), unary.group('op'), bool(unary.group('negate')), True))
+            continue
+        match = TABLE_FILTER_PART.match(part)
+        if not match:
+            terms.append((None, 'none', part, True))
+            continue
+        value = match.group('value').strip()
+        if len(value) >= 2 and value[0] == value[-1] and value[0] in '"\'`':
+            value = value[1:-1].replace('\\' + value[0], value[0])
+        terms.append((match.group('col'), TABLE_FILTER_OPERATORS[match.group('op')], value, match.group('case') != 'i'))
+    return terms
+
+def table_unary_mask(series, op):
+    """Rows of one column passing a unary filter operator, as the DataTable evaluates it in the browser"""
+    missing = series.isna().to_numpy()
+    is_text = pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series) or \
+        isinstance(series.dtype, pd.CategoricalDtype)
+    if op == 'nil':
+        return missing
+    if op == 'blank':
+        if not is_text:
+            return missing
+        return missing | (series.astype(str).str.strip() == '').to_numpy()
+    if op == 'str':
+        return ~missing if is_text else np.zeros(len(series), dtype=bool)
+    if op == 'bool':
+        return ~missing if pd.api.types.is_bool_dtype(series) else np.zeros(len(series), dtype=bool)
+    numeric = pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series)
+    if op == 'num':
+        return ~missing if numeric else np.zeros(len(series), dtype=bool)
+    if op in ('even', 'odd'):
+        if not numeric:
+            return np.zeros(len(series), dtype=bool)
+        values = series.to_numpy(dtype=np.float64, na_value=np.nan)
+        with np.errstate(invalid='ignore'):
+            return np.fmod(np.abs(values), 2) == (0 if op == 'even' else 1)
+    return np.zeros(len(series), dtype=bool)  # 'object': cells are never objects here
+
+def table_filter_mask(df, terms):
+    """Rows of df matching every parsed filter term (unknown columns are ignored)"""
+    mask = np.ones(len(df), dtype=bool)
+    for col, op, value, case_sensitive in terms:
+        if op == 'none':
+            mask[:] = False
+            continue
+        if col not in df.columns:
+            continue
+        series = df[col]
+        if op in TABLE_FILTER_UNARY_OPERATORS:
+            passes = table_unary_mask(series, op)
+            mask &= ~passes if value else passes
+            continue
+        if op in ('contains', 'datestartswith'):
+            text = series.astype(str)
+            if op == 'contains':
+                mask &= text.str.contains(value, case=case_sensitive, regex=False).to_numpy()
+            else:
+                mask &= text.str.startswith(value).to_numpy()
+            continue
+        if pd.api.types.is_numeric_dtype(series):
+            try:
+                value = float(value)
+            except ValueError:
+                mask[:] = False  # text compared to a number column matches nothing
+                continue
+            values = series.to_numpy()  # in its own dtype, so float32 cells equal the value they print as
+        else:
+            values = series.astype(str).to_numpy()
+            if not case_sensitive:
+                values, value = np.char.lower(values.astype(str)), value.lower()
+        mask &= {'eq': np.equal, 'ne': np.not_equal, 'gt': np.greater, 'ge': np.greater_equal,
+                 'lt': np.less, 'le': np.less_equal}[op](values, value)
+    return mask
+
+def table_sort_key(series):
+    # Categories in text order rather than the order they were first seen
+    return series.astype(str) if isinstance(series.dtype, pd.CategoricalDtype) else series
+
+def get_table_view(session, species_filter, site_filter, description_filter, sort_by, filter_query):
+    """Filtered frame narrowed by the table's filter row and sorted by its columns (memoized)"""
+    sort_by = [entry for entry in (sort_by or []) if entry['column_id'] in session['df'].columns]
+    key = ('table', session['dataset_id'], session['version'],
+           filters_key(species_filter, site_filter, description_filter),
+           tuple((entry['column_id'], entry['direction']) for entry in sort_by), filter_query or '')
+    
+    def build():
+        table_df = get_filtered_view(session, species_filter, site_filter, description_filter)
+        terms = parse_table_filter(filter_query)
+        if terms:
+            table_df = table_df[table_filter_mask(table_df, terms)]
+        if sort_by:
+            table_df = table_df.sort_values([entry['column_id'] for entry in sort_by],
+                                            ascending=[entry['direction'] == 'asc' for entry in sort_by],
+                                            kind='stable', key=table_sort_key)
+        return table_df
+    
+    return view_cache.get_or_build(key, build)
+
+def points_in_polygon(x, y, poly_x, poly_y):
+    """Even-odd test of many points against one polygon, one vectorized pass per edge"""
+    inside = np.zeros(len(x), dtype=bool)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for i in range(len(poly_x)):
+            x0, y0, x1, y1 = poly_x[i - 1], poly_y[i - 1], poly_x[i], poly_y[i]
+            inside ^= ((y0 > y) != (y1 > y)) & (x < (x1 - x0) * (y - y0) / (y1 - y0) + x0)
+    return inside
+
+def rows_in_selection(view_df, x_col, y_col, selected_data):
+    """
+    Row IDs of the filtered view inside a box or lasso selection (selectedData).
+    Tests every row rather than the drawn points, which may be a downsampled
+    or zoomed subset; falls back to the selected points' customdata for a
+    non-numeric axis or a plain click.
+    """
+    if not selected_data:
+        return np.empty(0, dtype=np.int64)
+    box = (selected_data.get('range') or {})
+    lasso = (selected_data.get('lassoPoints') or {})
+    if ('x' in box or 'x' in lasso) and all(pd.api.types.is_numeric_dtype(view_df[col]) for col in (x_col, y_col)):
+        x = view_df[x_col].to_numpy(dtype=np.float64, na_value=np.nan)
+        y = view_df[y_col].to_numpy(dtype=np.float64, na_value=np.nan)
+        if 'x' in box:
+            (x0, x1), (y0, y1) = sorted(box['x']), sorted(box['y'])
+            mask = (x >= x0) & (x <= x1) & (y >= y0) & (y <= y1)
+        else:
+            poly_x = np.asarray(lasso['x'], dtype=np.float64)
+            poly_y = np.asarray(lasso['y'], dtype=np.float64)
+            # Only rows inside the lasso's bounding box go through the polygon test
+            mask = (x >= poly_x.min()) & (x <= poly_x.max()) & (y >= poly_y.min()) & (y <= poly_y.max())
+            candidates = np.flatnonzero(mask)
+            mask[candidates] = points_in_polygon(x[candidates], y[candidates], poly_x, poly_y)
+        return view_df.index.to_numpy()[mask]
+    row_ids = {point['customdata'] for point in selected_data.get('points', []) if 'customdata' in point}
+    return np.array(sorted(row_ids), dtype=np.int64)
+
+def live_selection(session):
+    """Row IDs of the stored selection that still exist"""
+    selection = session['selection']
+    if selection is None or session['rows'] is None or len(selection) == 0:
+        return np.empty(0, dtype=np.int64)
+    return selection[np.isin(selection, session['df'].index.to_numpy())]
+
+def display_current_markers(markers):
+    if not markers:
         return "No markers set"
     
     marker_elements = []
-    for i, marker in enumerate(data_store['markers']):
+    for i, marker in enumerate(markers):
         color_emoji = {
             'red': '🔴', 'orange': '🟠', 'gold': '🟡', 'green': '🟢',
             'blue': '🔵', 'purple': '🟣', 'brown': '🟤', 'black': '⚫'
@@ -467,6 +2327,17 @@ def display_current_markers():
     
     return html.Div(marker_elements)
 
+@app.callback(
+    Output('session-id', 'data'),
+    [Input('session-id', 'modified_timestamp')],
+    [State('session-id', 'data')]
+)
+def init_session(modified_timestamp, session_id):
+    # Keep the id already held in the tab's sessionStorage
+    if session_id:
+        raise dash.exceptions.PreventUpdate
+    return uuid.uuid4().hex
+
 @app.callback(
     [Output('upload-status', 'children'),
      Output('x-column', 'options'),
@@ -476,22 +2347,42 @@ def display_current_markers():
      Output('species-filter', 'options'),
      Output('site-filter', 'options'),
      Output('description-filter', 'options'),
-     Output('data-store', 'children')],
+     Output('data-store', 'data')],
     [Input('upload-data', 'contents')],
-    [State('upload-data', 'filename')]
+    [State('upload-data', 'filename'),
+     State('session-id', 'data')]
 )
-def update_output(contents, filename):
+def update_output(contents, filename, session_id):
     if contents is None:
         # Return empty but defined values
-        return "", [], [], "", "", [], [], [], ""
-    
-    df, message = parse_contents(contents, filename)
-    if df is None:
-        return message, [], [], "", "", [], [], [], ""
-    
-    # Store data globally
-    data_store['df'] = df
-    data_store['original_df'] = df.copy()
+        return "", [], [], "", "", [], [], [], None
+    
+    # Stop polling for parse progress once this response arrives
+    dash.set_props('upload-progress-poll', {'disabled': True})
+    dash.set_props('upload-progress', {'children': ""})
+    
+    # Re-uploads of the same file skip parsing
+    source_key = content_key(contents)
+    df = upload_cache.get(source_key)
+    cached = df is not None
+    if cached:
+        message = f"Successfully loaded {len(df)} rows and {len(df.columns)} columns (from cache)"
+    else:
+        def report(text):
+            upload_progress[session_id] = text
+        try:
+            df, message = parse_contents(contents, filename, report)
+        finally:
+            upload_progress.pop(session_id, None)
+        if df is None:
+            return message, [], [], "", "", [], [], [], None
+        upload_cache.put(source_key, df)
+    
+    # Store data for this session only; reset re-reads the cached copy or unwinds the edit log
+    session = session_store.bump_version(session_id, rows_changed=True, rows=RowBuffer(df), edit_log=EditLog(),
+                                         source_key=source_key, dataset_id=uuid.uuid4().hex, x_col=None, y_col=None,
+                                         selection=None)
+    edit_journal.start(session_id, session)
     
     # Get column options
     all_columns = [{'label': col, 'value': col} for col in df.columns]
@@ -522,7 +2413,30 @@ def update_output(contents, filename):
     elif len(numeric_columns) > 0:
         y_default = numeric_columns[0]['value']
     
-    return message, all_columns, numeric_columns, x_default, y_default, species_options, site_options, description_options, df.to_json()
+    return message, all_columns, numeric_columns, x_default, y_default, species_options, site_options, description_options, dataset_token(session)
+
+# upload-status only shows a spinner while update_output runs, so a large
+# upload's parse progress is polled into upload-progress until it finishes.
+app.clientside_callback(
+    """
+    function(contents) {
+        return !contents;
+    }
+    """,
+    Output('upload-progress-poll', 'disabled'),
+    Input('upload-data', 'contents'),
+    prevent_initial_call=True
+)
+
+@app.callback(
+    Output('upload-progress', 'children'),
+    Input('upload-progress-poll', 'n_intervals'),
+    State('session-id', 'data'),
+    prevent_initial_call=True
+)
+def poll_upload_progress(n_intervals, session_id):
+    # Progress is held by the worker parsing the upload; other workers show nothing
+    return upload_progress.get(session_id, "")
 
 @app.callback(
     Output('filter-status', 'children'),
@@ -549,8 +2463,44 @@ def update_filter_status(species_filter, site_filter, description_filter):
     
     return f"🔍 Filtered by: {' | '.join(status_parts)}"
 
-@app.callback(
-    [Output('current-markers', 'children'),
+# Markers live in the browser's marker-store: adding or removing one is handled
+# client-side, redrawn on the figure by draw_markers and saved by save_markers.
+app.clientside_callback(
+    """
+    function(addClicks, springClicks, peakClicks, autumnClicks, winterClicks, clearClicks, removeClicks,
+             markerDoy, markerLabel, markerColor, markers) {
+        const noUpdate = window.dash_clientside.no_update;
+        const ctx = window.dash_clientside.callback_context;
+        const trigger = ctx.triggered_id;
+        if (!trigger || !ctx.triggered.length || !ctx.triggered[0].value) {
+            return [noUpdate, noUpdate, noUpdate];
+        }
+        const presets = {
+            'preset-spring': {doy: 80, label: 'Spring Start', color: 'green'},
+            'preset-peak': {doy: 150, label: 'Peak Growing', color: 'orange'},
+            'preset-autumn': {doy: 245, label: 'Autumn Start', color: 'brown'},
+            'preset-winter': {doy: 335, label: 'Winter Start', color: 'blue'}
+        };
+        const updated = (markers || []).slice();
+        if (typeof trigger === 'object') {
+            // One of the x buttons of the current marker list
+            updated.splice(trigger.index, 1);
+        } else if (trigger === 'clear-markers-btn') {
+            updated.length = 0;
+        } else if (trigger in presets) {
+            updated.push(presets[trigger]);
+        } else if (trigger === 'add-marker-btn') {
+            if (markerDoy === null || markerDoy === undefined || markerDoy === '' || !markerLabel) {
+                return [noUpdate, noUpdate, noUpdate];
+            }
+            updated.push({doy: markerDoy, label: markerLabel, color: markerColor || 'red'});
+            // Clear input fields after adding
+            return [updated, '', ''];
+        }
+        return [updated, noUpdate, noUpdate];
+    }
+    """,
+    [Output('marker-store', 'data'),
      Output('marker-doy', 'value'),
      Output('marker-label', 'value')],
     [Input('add-marker-btn', 'n_clicks'),
@@ -558,174 +2508,411 @@ def update_filter_status(species_filter, site_filter, description_filter):
      Input('preset-peak', 'n_clicks'),
      Input('preset-autumn', 'n_clicks'),
      Input('preset-winter', 'n_clicks'),
-     Input('clear-markers-btn', 'n_clicks')],
+     Input('clear-markers-btn', 'n_clicks'),
+     Input({'type': 'remove-marker', 'index': ALL}, 'n_clicks')],
     [State('marker-doy', 'value'),
      State('marker-label', 'value'),
-     State('marker-color', 'value')]
+     State('marker-color', 'value'),
+     State('marker-store', 'data')],
+    prevent_initial_call=True
 )
-def manage_markers(add_clicks, spring_clicks, peak_clicks, autumn_clicks, winter_clicks, clear_clicks,
-                   marker_doy, marker_label, marker_color):
-    ctx = callback_context
-    
-    if ctx.triggered:
-        trigger_id = ctx.triggered[0]['prop_id']
-        
-        # Handle clear all markers
-        if 'clear-markers-btn' in trigger_id:
-            data_store['markers'] = []
-        
-        # Handle preset buttons
-        elif 'preset-spring' in trigger_id:
-            data_store['markers'].append({
-                'doy': 80,
-                'label': 'Spring Start',
-                'color': 'green'
-            })
-        elif 'preset-peak' in trigger_id:
-            data_store['markers'].append({
-                'doy': 150,
-                'label': 'Peak Growing',
-                'color': 'orange'
-            })
-        elif 'preset-autumn' in trigger_id:
-            data_store['markers'].append({
-                'doy': 245,
-                'label': 'Autumn Start',
-                'color': 'brown'
-            })
-        elif 'preset-winter' in trigger_id:
-            data_store['markers'].append({
-                'doy': 335,
-                'label': 'Winter Start',
-                'color': 'blue'
-            })
-        
-        # Handle manual add marker
-        elif 'add-marker-btn' in trigger_id and marker_doy is not None and marker_label:
-            data_store['markers'].append({
-                'doy': marker_doy,
-                'label': marker_label,
-                'color': marker_color or 'red'
-            })
-            
-            # Clear input fields after adding
-            return display_current_markers(), "", ""  # ← Changed None to ""
-    
-    return display_current_markers(), marker_doy or "", marker_label or ""  # ← Handle None values
 
-@app.callback(
-    Output('current-markers', 'children', allow_duplicate=True),
-    [Input({'type': 'remove-marker', 'index': ALL}, 'n_clicks')],
-    prevent_initial_call=True
-)
-def remove_marker(remove_clicks):
-    ctx = callback_context
-    if not ctx.triggered or not any(remove_clicks):
-        return display_current_markers()
-    
-    # Find which marker to remove
-    for i, clicks in enumerate(remove_clicks):
-        if clicks:
-            if i < len(data_store['markers']):
-                data_store['markers'].pop(i)
-            break
+app.clientside_callback(
+    """
+    function(markers, figure) {
+        // Swap the marker lines and labels of the current figure (same shapes as marker_overlays)
+        const noUpdate = window.dash_clientside.no_update;
+        if (!markers || !figure || !figure.layout || !figure.layout.meta) {
+            return noUpdate;
+        }
+        const overlay = '%s';
+        const [xMin, xMax] = figure.layout.meta.x_range;
+        const shapes = (figure.layout.shapes || []).filter(shape => shape.name !== overlay);
+        const annotations = (figure.layout.annotations || []).filter(note => note.name !== overlay);
+        markers.forEach(marker => {
+            if (!(xMin <= marker.doy && marker.doy <= xMax)) {
+                return;
+            }
+            shapes.push({type: 'line', name: overlay, x0: marker.doy, x1: marker.doy, xref: 'x',
+                         y0: 0, y1: 1, yref: 'y domain', line: {color: marker.color, width: 2, dash: 'dashdot'}});
+            annotations.push({name: overlay, text: marker.label, x: marker.doy, xref: 'x', xanchor: 'center',
+                              y: 1, yref: 'y domain', yanchor: 'bottom', textangle: 90, showarrow: false,
+                              font: {size: 12, color: marker.color}, bgcolor: 'rgba(255,255,255,0.8)',
+                              bordercolor: marker.color, borderwidth: 1});
+        });
+        // Marker count in the title (see plot_title)
+        const title = Object.assign({}, figure.layout.title);
+        if (title.text) {
+            const parts = title.text.split(' • ').filter(part => !part.startsWith('📅'));
+            if (markers.length) {
+                parts.splice(parts.length - 1, 0, `📅 ${markers.length} markers`);
+            }
+            title.text = parts.join(' • ');
+        }
+        const layout = Object.assign({}, figure.layout, {shapes: shapes, annotations: annotations, title: title});
+        return Object.assign({}, figure, {layout: layout});
+    }
+    """ % MARKER_OVERLAY,
+    Output('interactive-plot', 'figure', allow_duplicate=True),
+    Input('marker-store', 'data'),
+    State('interactive-plot', 'figure'),
+    prevent_initial_call=True
+)
+
+@app.callback(
+    Output('marker-store', 'data', allow_duplicate=True),
+    [Input('session-id', 'data')],
+    prevent_initial_call='initial_duplicate'
+)
+def load_markers(session_id):
+    # Markers saved for this session, e.g. before a page reload
+    return list(session_store.get(session_id)['markers'])
+
+@app.callback(
+    Output('current-markers', 'children'),
+    [Input('marker-store', 'data')],
+    [State('session-id', 'data')]
+)
+def save_markers(markers, session_id):
+    markers = markers or []
+    if markers != session_store.get(session_id)['markers']:
+        session_store.update(session_id, markers=markers)
+    return display_current_markers(markers)
+
+def downsample_minmax(y, max_points):
+    """
+    Positions to draw from an X-sorted series: the min and max Y of each of
+    max_points / 2 equal-count buckets, plus both end points. Keeps the
+    outliers an editor is looking for.
+    """
+    n = len(y)
+    if n <= max_points:
+        return np.arange(n)
+    n_buckets = max(max_points // 2, 1)
+    starts = (np.arange(n_buckets) * n) // n_buckets
+    sizes = np.diff(np.append(starts, n))
+    y = np.asarray(y, dtype=np.float64)
+    low = np.where(np.isnan(y), np.inf, y)
+    high = np.where(np.isnan(y), -np.inf, y)
+    positions = np.arange(n)
+    # First position in each bucket that holds the bucket's min / max
+    idx_min = np.minimum.reduceat(np.where(low == np.repeat(np.minimum.reduceat(low, starts), sizes), positions, n), starts)
+    idx_max = np.minimum.reduceat(np.where(high == np.repeat(np.maximum.reduceat(high, starts), sizes), positions, n), starts)
+    keep = np.unique(np.concatenate([idx_min, idx_max, [0, n - 1]]))
+    return keep[keep < n]
+
+def visible_slice(sorted_df, x_col, x_window, margin=0):
+    """Rows of an X-sorted frame inside the visible X window, plus margin rows each side"""
+    if x_window is None or not pd.api.types.is_numeric_dtype(sorted_df[x_col]):
+        return sorted_df
+    x = sorted_df[x_col].to_numpy()
+    lo = max(int(np.searchsorted(x, x_window[0], side='left')) - margin, 0)
+    hi = min(int(np.searchsorted(x, x_window[1], side='right')) + margin, len(x))
+    return sorted_df.iloc[lo:hi]
+
+def level_of_detail(trace_df, x_col, y_col, x_window):
+    """
+    Rows of an X-sorted trace to send to the browser: those inside the visible
+    X window (plus one neighbour each side so the line runs off the edge),
+    downsampled to LOD_MAX_POINTS. Zooming in re-queries at full resolution.
+    """
+    window = visible_slice(trace_df, x_col, x_window, margin=1)
+    return window.iloc[downsample_minmax(window[y_col].to_numpy(), LOD_MAX_POINTS)]
+
+def viewport_window(viewport, session, x_col):
+    """[x0, x1] of the current zoom, if it belongs to this dataset and X column"""
+    if not viewport or viewport.get('dataset') != session['dataset_id'] or viewport.get('x_col') != x_col:
+        return None
+    x_range = viewport.get('range')
+    if not x_range or len(x_range) != 2:
+        return None
+    try:
+        return sorted(float(v) for v in x_range)
+    except (TypeError, ValueError):
+        return None
+
+def marker_overlays(markers, x_min, x_max):
+    """
+    Dashed vertical lines and labels of the markers inside the data range, as
+    layout shapes and annotations named MARKER_OVERLAY. The browser redraws
+    them the same way (draw_markers) when markers change.
+    """
+    shapes, annotations = [], []
+    for marker in markers:
+        # Only add marker if it's within the data range
+        if not x_min <= marker['doy'] <= x_max:
+            continue
+        shapes.append(dict(type='line', name=MARKER_OVERLAY, x0=marker['doy'], x1=marker['doy'], xref='x',
+                           y0=0, y1=1, yref='y domain', line=dict(color=marker['color'], width=2, dash='dashdot')))
+        annotations.append(dict(name=MARKER_OVERLAY, text=marker['label'], x=marker['doy'], xref='x', xanchor='center',
+                                y=1, yref='y domain', yanchor='bottom', textangle=90, showarrow=False,
+                                font=dict(size=12, color=marker['color']), bgcolor='rgba(255,255,255,0.8)',
+                                bordercolor=marker['color'], borderwidth=1))
+    return shapes, annotations
+
+def plot_title(x_col, y_col, n_points, species_filter, site_filter, n_markers, y_mean):
+    title_parts = [f'{y_col} vs {x_col} - {n_points} points']
+    if species_filter:
+        title_parts.append(f"Species: {', '.join(species_filter)}")
+    if site_filter:
+        title_parts.append(f"Sites: {', '.join(site_filter)}")
+    if n_markers:
+        title_parts.append(f"📅 {n_markers} markers")
+    title_parts.append(f"Mean: {y_mean:.3f}")
+    return ' • '.join(title_parts)
+
+def mean_axis_layout(y_mean):
+    """Secondary axis centred on the mean level"""
+    return dict(
+        title='Mean Level (Arbitrary Units)',
+        side='right',
+        overlaying='y',
+        range=[y_mean - abs(y_mean) * 0.1, y_mean + abs(y_mean) * 0.1],
+        tickmode='linear',
+        tick0=y_mean,
+        dtick=abs(y_mean) * 0.05 if y_mean != 0 else 0.1
+    )
+
+def build_stats_panel(y_mean, y_std, y_min, y_max, n_filtered, n_total,
+                      species_filter, site_filter, description_filter):
+    filter_info = ""
+    if species_filter or site_filter or description_filter:
+        filter_parts = []
+        if species_filter:
+            filter_parts.append(f"Species: {', '.join(species_filter)}")
+        if site_filter:
+            filter_parts.append(f"Sites: {', '.join(site_filter)}")
+        if description_filter:
+            filter_parts.append(f"Desc: {', '.join(description_filter)}")
+        filter_info = f" ({' | '.join(filter_parts)})"
     
-    return display_current_markers()
+    return html.Div([
+        html.H5(f"📊 Statistics{filter_info}", style={'marginBottom': '10px', 'color': '#495057'}),
+        html.Div([
+            html.Span(f"Mean: ", style={'fontWeight': 'bold'}),
+            html.Span(f"{y_mean:.4f}", style={'color': 'green', 'fontWeight': 'bold', 'fontSize': '16px'}),
+            html.Span(" | ", style={'margin': '0 10px', 'color': '#6c757d'}),
+            html.Span(f"Std: ", style={'fontWeight': 'bold'}),
+            html.Span(f"{y_std:.4f}", style={'color': '#007bff'}),
+            html.Span(" | ", style={'margin': '0 10px', 'color': '#6c757d'}),
+            html.Span(f"Range: ", style={'fontWeight': 'bold'}),
+            html.Span(f"{y_min:.3f} - {y_max:.3f}", style={'color': '#6f42c1'}),
+            html.Span(" | ", style={'margin': '0 10px', 'color': '#6c757d'}),
+            html.Span(f"Filtered: ", style={'fontWeight': 'bold'}),
+            html.Span(f"{n_filtered}/{n_total}", style={'color': '#dc3545', 'fontWeight': 'bold', 'fontSize': '16px'}),
+        ])
+    ])
+
+def build_figure_map(session, view, filters, x_col, y_col, trend_rows, edit_trace, edit_rows, mean_traces):
+    """
+    Where every row of the dataset sits in the figure just built: its trend
+    trace and position there, and its position in the "Edit Points" trace
+    (edit_trace is None when the overlay is merged into the trend traces).
+    Arrays are indexed by row ID. Lets a nudge be sent as a Patch of a few values.
+    """
+    n_rows = session['rows'].next_id
+    trend_trace = np.full(n_rows, -1, dtype=np.int32)
+    trend_pos = np.full(n_rows, -1, dtype=np.int32)
+    for trace_idx, rows in enumerate(trend_rows):
+        trend_trace[rows] = trace_idx
+        trend_pos[rows] = np.arange(len(rows), dtype=np.int32)
+    edit_pos = None
+    if edit_trace is not None:
+        edit_pos = np.full(n_rows, -1, dtype=np.int32)
+        edit_pos[edit_rows] = np.arange(len(edit_rows), dtype=np.int32)
+    return {
+        'dataset_id': session['dataset_id'],
+        'version': session['version'],
+        'key': (filters, x_col, y_col),
+        'trend_rows': trend_rows,
+        'trend_trace': trend_trace,
+        'trend_pos': trend_pos,
+        'edit_trace': edit_trace,
+        'edit_pos': edit_pos,
+        'mean_traces': mean_traces,
+        'x_min': view['x_min'],
+        'x_max': view['x_max'],
+        'n_filtered': len(view['filtered']),
+    }
+
+def build_nudge_patch(session_id, session, old_version, moved, species_filter, site_filter, description_filter,
+                      x_col, y_col, n_markers):
+    """
+    Partial figure update for one nudged point: its coordinate in the trend and
+    "Edit Points" traces, the mean line and title. Returns (patch, stats) or
+    None when the figure has to be rebuilt (the point changes its place in the
+    X-sorted line, the X range changes, or the figure in the browser is not
+    the one this worker last built).
+    """
+    filters = filters_key(species_filter, site_filter, description_filter)
+    fig_map = figure_maps.get(session_id)
+    if (fig_map is None or fig_map['dataset_id'] != session['dataset_id'] or fig_map['version'] != old_version
+            or fig_map['key'] != (filters, x_col, y_col)):
+        return None
+    if x_col in FILTER_COLUMNS or y_col in FILTER_COLUMNS:
+        return None
+    
+    row = moved['row']
+    if row >= len(fig_map['trend_trace']):
+        return None
+    if fig_map['edit_trace'] is None and fig_map['trend_trace'][row] < 0:
+        return None
+    if fig_map['edit_trace'] is not None and fig_map['edit_pos'][row] < 0:
+        return None
+    stats_entry = running_stats.get((session['dataset_id'], filters, y_col))
+    if stats_entry is None or stats_entry['version'] != session['version']:
+        return None
+    
+    df = session['df']
+    trace, pos = int(fig_map['trend_trace'][row]), int(fig_map['trend_pos'][row])
+    if moved['axis'] == 'x':
+        if not (fig_map['x_min'] < moved['old'] < fig_map['x_max'] and fig_map['x_min'] <= moved['new'] <= fig_map['x_max']):
+            return None
+        if trace >= 0:
+            # Must stay between its neighbours in the sorted line (ties sort by row ID)
+            rows = fig_map['trend_rows'][trace]
+            if pos > 0 and not (numeric_cell(df, rows[pos - 1], x_col), rows[pos - 1]) < (moved['new'], row):
+                return None
+            if pos < len(rows) - 1 and not (moved['new'], row) < (numeric_cell(df, rows[pos + 1], x_col), rows[pos + 1]):
+                return None
+    
+    col = x_col if moved['axis'] == 'x' else y_col
+    value = plain_value(df.at[row, col])
+    stats = stats_entry['stats']
+    y_mean = stats.mean
+    
+    patch = Patch()
+    if fig_map['edit_trace'] is not None:
+        patch['data'][fig_map['edit_trace']][moved['axis']][int(fig_map['edit_pos'][row])] = value
+    if trace >= 0:
+        patch['data'][trace][moved['axis']][pos] = value
+    mean_trace, axis_trace = fig_map['mean_traces']
+    patch['data'][mean_trace]['y'] = [y_mean, y_mean]
+    patch['data'][mean_trace]['name'] = f'Mean: {y_mean:.3f}'
+    patch['data'][mean_trace]['hovertemplate'] = f'<b>Mean Level</b>: {y_mean:.3f}<extra></extra>'
+    patch['data'][axis_trace]['y'] = [y_mean, y_mean]
+    patch['layout']['title']['text'] = plot_title(x_col, y_col, fig_map['n_filtered'], species_filter, site_filter,
+                                                  n_markers, y_mean)
+    patch['layout']['yaxis2'] = mean_axis_layout(y_mean)
+    
+    fig_map['version'] = session['version']
+    return patch, stats, fig_map['n_filtered']
 
 @app.callback(
-    [Output('interactive-plot', 'figure'),
-     Output('status', 'children'),
-     Output('plot-stats', 'children')],
-    [Input('plot-btn', 'n_clicks'),
-     Input('update-point-btn', 'n_clicks'),
+    [Output('status', 'children', allow_duplicate=True),
+     Output('data-store', 'data', allow_duplicate=True)],
+    [Input('update-point-btn', 'n_clicks'),
      Input('add-point-btn', 'n_clicks'),
      Input('remove-point-btn', 'n_clicks'),
+     Input('fill-gaps-btn', 'n_clicks'),
+     Input('undo-btn', 'n_clicks'),
+     Input('redo-btn', 'n_clicks'),
      Input('x-minus-btn', 'n_clicks'),
      Input('x-plus-btn', 'n_clicks'),
      Input('y-minus-btn', 'n_clicks'),
      Input('y-plus-btn', 'n_clicks'),
-     Input('species-filter', 'value'),
-     Input('site-filter', 'value'),
-     Input('description-filter', 'value'),
-     Input('add-marker-btn', 'n_clicks'),
-     Input('preset-spring', 'n_clicks'),
-     Input('preset-peak', 'n_clicks'),
-     Input('preset-autumn', 'n_clicks'),
-     Input('preset-winter', 'n_clicks'),
-     Input('clear-markers-btn', 'n_clicks'),
-     Input({'type': 'remove-marker', 'index': ALL}, 'n_clicks')],
-    [State('x-column', 'value'),
-     State('y-column', 'value'),
+     Input('nudge-commit', 'data'),
+     Input('data-table', 'data_timestamp'),
+     Input('bulk-shift-btn', 'n_clicks'),
+     Input('bulk-scale-btn', 'n_clicks'),
+     Input('bulk-delete-btn', 'n_clicks')],
+    [State('data-table', 'data'),
+     State('data-table', 'data_previous'),
+     State('species-filter', 'value'),
+     State('site-filter', 'value'),
+     State('description-filter', 'value'),
      State('new-x-value', 'value'),
      State('new-y-value', 'value'),
      State('add-x-value', 'value'),
      State('add-y-value', 'value'),
+     State('gap-step', 'value'),
      State('selected-point', 'children'),
-     State('step-size', 'value')]
+     State('step-size', 'value'),
+     State('bulk-dx', 'value'),
+     State('bulk-dy', 'value'),
+     State('bulk-scale', 'value'),
+     State('session-id', 'data')],
+    prevent_initial_call=True
 )
-def update_plot(plot_clicks, update_clicks, add_clicks, remove_clicks, 
-                x_minus_clicks, x_plus_clicks, y_minus_clicks, y_plus_clicks,
-                species_filter, site_filter, description_filter,
-                add_marker_clicks, spring_clicks, peak_clicks, autumn_clicks, winter_clicks, clear_markers_clicks, remove_marker_clicks,
-                x_col, y_col, new_x, new_y, add_x, add_y, selected_point, step_size):
+@with_session_lock
+def edit_data(update_clicks, add_clicks, remove_clicks, fill_gaps_clicks, undo_clicks, redo_clicks,
+              x_minus_clicks, x_plus_clicks, y_minus_clicks, y_plus_clicks, nudge_commit, table_timestamp,
+              bulk_shift_clicks, bulk_scale_clicks, bulk_delete_clicks,
+              table_data, table_previous, species_filter, site_filter, description_filter,
+              new_x, new_y, add_x, add_y, gap_step, selected_point, step_size, bulk_dx, bulk_dy, bulk_scale,
+              session_id):
+    """
+    Apply one edit to the session's rows and hand the new dataset version to
+    the data-store; the plot, table and selection re-render from there.
+    """
     ctx = callback_context
+    session = session_store.get(session_id)
+    store_token = dash.no_update
     
-    if data_store['df'] is None:
-        return {}, "Load data first", ""
-    
-    df = data_store['df']
-    
-    # Apply filters to get the working dataset
-    filtered_df = apply_filters(df, species_filter, site_filter, description_filter)
+    if session['df'] is None:
+        return "Load data first", store_token
     
-    if len(filtered_df) == 0:
-        return {}, "❌ No data matches the selected filters", ""
+    rows = session['rows']
+    df = session['df']
+    status_message = dash.no_update
     
-    # Handle editing operations on the full dataset
-    status_message = f"Plotted {len(filtered_df)} points (filtered from {len(df)} total)"
+    # (old_y, new_y) of edited rows in the current filter group, for the running statistics
+    # (None when the group statistics have to be rebuilt)
+    stats_changes = []
+    old_version = session['version']
+    replayed = None  # EditLog entry reverted/re-applied by undo/redo
+    moved_point = None  # single-axis nudge that may be sent as a Patch
+    edit = None  # EditLog entry of this action
     
     # Handle different button clicks - these operate on the full dataset
     if ctx.triggered:
         trigger_id = ctx.triggered[0]['prop_id']
         
-        # Handle fine-tuning buttons
-        if selected_point != "None" and step_size is not None:
+        # Fine-tuning moves: one step from the buttons, or a batch of arrow-key steps made in the browser
+        nudge = None
+        button_steps = {'x-minus-btn': (-1, 0), 'x-plus-btn': (1, 0), 'y-minus-btn': (0, -1), 'y-plus-btn': (0, 1)}
+        if 'nudge-commit' in trigger_id and nudge_commit:
+            nudge = (nudge_commit['row'], nudge_commit.get('dx') or 0, nudge_commit.get('dy') or 0)
+        elif trigger_id.split('.')[0] in button_steps and selected_point != "None" and step_size is not None:
+            nudge = (selected_point, *button_steps[trigger_id.split('.')[0]])  # in steps, sized below
+        
+        if nudge is not None and (not session['x_col'] or not session['y_col']):
+            # A new upload whose plot is not created yet, while an old point is still selected
+            status_message = "❌ Create a plot before moving points"
+        elif nudge is not None:
             try:
-                
-                point_idx = int(selected_point)
-                current_x = df.iloc[point_idx, df.columns.get_loc(data_store['x_col'])]
-                current_y = df.iloc[point_idx, df.columns.get_loc(data_store['y_col'])]
-
-                if data_store['x_col'] == 'DOY':
-                    x_step_size = 1  # Whole days for DOY
-                elif 'date' in data_store['x_col'].lower():
-                    x_step_size = 1  # Whole days for any date column
-                else:
-                    x_step_size = step_size  # Use user-defined for other X columns
-                
-                if 'x-minus-btn' in trigger_id:
-                    new_x_val = current_x - x_step_size
-                    df.iloc[point_idx, df.columns.get_loc(data_store['x_col'])] = new_x_val
-                    status_message = f"⬅️ Moved point {point_idx} X: {current_x:.3f} → {new_x_val:.3f}"
-                    x_col, y_col = data_store['x_col'], data_store['y_col']
-                elif 'x-plus-btn' in trigger_id:
-                    new_x_val = current_x + x_step_size
-                    df.iloc[point_idx, df.columns.get_loc(data_store['x_col'])] = new_x_val
-                    status_message = f"➡️ Moved point {point_idx} X: {current_x:.3f} → {new_x_val:.3f}"
-                    x_col, y_col = data_store['x_col'], data_store['y_col']
-                elif 'y-minus-btn' in trigger_id:
-                    new_y_val = current_y - step_size
-                    df.iloc[point_idx, df.columns.get_loc(data_store['y_col'])] = new_y_val
-                    status_message = f"⬇️ Moved point {point_idx} Y: {current_y:.3f} → {new_y_val:.3f}"
-                    x_col, y_col = data_store['x_col'], data_store['y_col']
-                elif 'y-plus-btn' in trigger_id:
-                    new_y_val = current_y + step_size
-                    df.iloc[point_idx, df.columns.get_loc(data_store['y_col'])] = new_y_val
-                    status_message = f"⬆️ Moved point {point_idx} Y: {current_y:.3f} → {new_y_val:.3f}"
-                    x_col, y_col = data_store['x_col'], data_store['y_col']
-                    
-                # Re-apply filters after editing
-                filtered_df = apply_filters(df, species_filter, site_filter, description_filter)
+                point_idx, dx, dy = int(nudge[0]), nudge[1], nudge[2]
+                if 'nudge-commit' not in trigger_id:
+                    dx, dy = dx * x_step(session['x_col'], step_size), dy * step_size
+                cells = []
+                moves = []
+                for axis, col, delta in (('x', session['x_col'], dx), ('y', session['y_col'], dy)):
+                    if not delta:
+                        continue
+                    current = plain_value(df.at[point_idx, col])
+                    old_stat = numeric_cell(df, point_idx, col)
+                    new = current + delta
+                    if isinstance(new, float):
+                        new = float(round_float_noise(new))
+                    rows.set_cell(point_idx, col, new)
+                    cells.append((point_idx, col, current, new))
+                    moves.append((axis, col, old_stat, current, delta))
+                if cells:
+                    df = rows.frame()
+                    edit = {'op': 'set', 'cells': cells}
+                    for axis, col, old_stat, current, delta in moves:
+                        if axis == 'y' and row_in_filters(df, point_idx, species_filter, site_filter, description_filter):
+                            stats_changes.append((old_stat, numeric_cell(df, point_idx, col)))
+                    if len(moves) == 1:
+                        axis, col, old_stat, current, delta = moves[0]
+                        moved_point = {'row': point_idx, 'axis': axis, 'old': old_stat,
+                                       'new': numeric_cell(df, point_idx, col)}
+                        arrow = {('x', False): '⬅️', ('x', True): '➡️', ('y', False): '⬇️', ('y', True): '⬆️'}[(axis, delta > 0)]
+                    else:
+                        arrow = '🎯'
+                    moved = ', '.join(f"{axis.upper()}: {current:.3f} → {current + delta:.3f}"
+                                      for axis, col, old_stat, current, delta in moves)
+                    status_message = f"{arrow} Moved point {point_idx} {moved}"
             except:
                 pass
         
@@ -736,33 +2923,38 @@ def update_plot(plot_clicks, update_clicks, add_clicks, remove_clicks,
                     point_idx = int(selected_point)
                     
                     # Update the dataframe
-                    df.iloc[point_idx, df.columns.get_loc(data_store['x_col'])] = new_x
-                    df.iloc[point_idx, df.columns.get_loc(data_store['y_col'])] = new_y
+                    old_stat = numeric_cell(df, point_idx, session['y_col'])
+                    old_x = plain_value(df.at[point_idx, session['x_col']])
+                    old_y = plain_value(df.at[point_idx, session['y_col']])
+                    rows.set_cell(point_idx, session['x_col'], new_x)
+                    rows.set_cell(point_idx, session['y_col'], new_y)
+                    df = rows.frame()
+                    edit = {'op': 'set', 'cells': [(point_idx, session['x_col'], old_x, new_x),
+                                                   (point_idx, session['y_col'], old_y, new_y)]}
+                    if row_in_filters(df, point_idx, species_filter, site_filter, description_filter):
+                        stats_changes.append((old_stat, numeric_cell(df, point_idx, session['y_col'])))
                     
                     status_message = f"✅ Updated point {point_idx} to ({new_x}, {new_y})"
-                    
-                    # Use current plot columns
-                    x_col = data_store['x_col']
-                    y_col = data_store['y_col']
-                    
-                    # Re-apply filters after editing
-                    filtered_df = apply_filters(df, species_filter, site_filter, description_filter)
                 except Exception as e:
                     status_message = f"❌ Error updating point: {str(e)}"
         
         # Handle point addition
         elif 'add-point-btn' in trigger_id:
-            if add_x is not None and add_y is not None and data_store['x_col'] and data_store['y_col']:
+            if add_x is not None and add_y is not None and session['x_col'] and session['y_col']:
                 try:
                     # Create new row with interpolated values respecting current filters
-                    new_row = create_interpolated_row(df, add_x, data_store['x_col'], data_store['y_col'], add_y, 
-                                species_filter, site_filter)
+                    new_row = create_interpolated_row(df, add_x, session['x_col'], session['y_col'], add_y, 
+                                species_filter, site_filter,
+                                get_interpolation_order(session, session['x_col'], species_filter, site_filter))
                     
                     # Check if we got a valid row
                     if new_row is not None:
                         # Add the new row to main dataframe
-                        df = pd.concat([df, new_row.to_frame().T], ignore_index=True)
-                        data_store['df'] = df
+                        new_id = int(rows.append(new_row.to_frame().T)[0])
+                        df = rows.frame()
+                        edit = {'op': 'add', 'rows': df.loc[[new_id]]}
+                        if row_in_filters(df, new_id, species_filter, site_filter, description_filter):
+                            stats_changes.append((None, numeric_cell(df, new_id, session['y_col'])))
                         
                         # Build status message with filter info
                         filter_info = []
@@ -774,9 +2966,9 @@ def update_plot(plot_clicks, update_clicks, add_clicks, remove_clicks,
                         # Determine interpolation context
                         context_info = ""
                         if len(df) > 1:
-                            if add_x <= df[data_store['x_col']].min():
+                            if add_x <= df[session['x_col']].min():
                                 context_info = " (extrapolated from first)"
-                            elif add_x >= df[data_store['x_col']].max():
+                            elif add_x >= df[session['x_col']].max():
                                 context_info = " (extrapolated from last)"
                             else:
                                 context_info = " (interpolated)"
@@ -788,13 +2980,6 @@ def update_plot(plot_clicks, update_clicks, add_clicks, remove_clicks,
                     else:
                         status_message = "❌ Failed to create interpolated point"
 
-                    
-                    # Use current plot columns
-                    x_col = data_store['x_col']
-                    y_col = data_store['y_col']
-                    
-                    # Re-apply filters after adding
-                    filtered_df = apply_filters(df, species_filter, site_filter, description_filter)
                 except Exception as e:
                     status_message = f"❌ Error adding point: {str(e)}"
         
@@ -805,41 +2990,242 @@ def update_plot(plot_clicks, update_clicks, add_clicks, remove_clicks,
                     point_idx = int(selected_point)
                     
                     # Remove the point from main dataframe
-                    df = df.drop(df.index[point_idx]).reset_index(drop=True)
-                    data_store['df'] = df
+                    if row_in_filters(df, point_idx, species_filter, site_filter, description_filter):
+                        stats_changes.append((numeric_cell(df, point_idx, session['y_col']), None))
+                    edit = {'op': 'delete', 'rows': df.loc[[point_idx]]}
+                    rows.delete(point_idx)
+                    df = rows.frame()
                     
                     status_message = f"🗑️ Removed point {point_idx}. Total points: {len(df)}"
-                    
-                    # Use current plot columns
-                    x_col = data_store['x_col']
-                    y_col = data_store['y_col']
-                    
-                    # Re-apply filters after removal
-                    filtered_df = apply_filters(df, species_filter, site_filter, description_filter)
                 except Exception as e:
                     status_message = f"❌ Error removing point: {str(e)}"
+        
+        # Handle bulk gap filling
+        elif 'fill-gaps-btn' in trigger_id:
+            if not session['x_col'] or not session['y_col']:
+                status_message = "❌ Create a plot before filling gaps"
+            elif not all(col in df.columns for col in ['Sc', 'SiteC']):
+                status_message = "❌ Gap filling needs Sc and SiteC columns"
+            elif not gap_step or gap_step <= 0:
+                status_message = "❌ Enter a positive step"
+            else:
+                try:
+                    new_rows, counts = fill_gaps(session, session['x_col'], session['y_col'], gap_step,
+                                                 species_filter, site_filter, description_filter)
+                    if len(new_rows) > 0:
+                        new_ids = rows.append(new_rows)
+                        df = rows.frame()
+                        edit = {'op': 'add', 'rows': df.loc[new_ids]}
+                    stats_changes = None  # descriptions of new rows decide their membership, rebuild
+                    
+                    status_message = [
+                        f"✅ Filled {len(new_rows)} gaps at step {gap_step} in {len(counts)} species/site groups",
+                        html.Ul([html.Li(f"{species} / {site}: +{n}") for (species, site), n in counts],
+                                style={'margin': '5px 0 0 0', 'columns': 3}),
+                    ]
+                except Exception as e:
+                    status_message = f"❌ Error filling gaps: {str(e)}"
+        
+        # Cells edited or pasted in the data table, written back as one edit
+        elif 'data-table' in trigger_id:
+            changes = table_changes(table_data, table_previous)
+            try:
+                if changes:
+                    missing = {row_id for row_id, _, _ in changes if row_id not in rows}
+                    if missing:
+                        raise ValueError(f"point {min(missing)} no longer exists")
+                    by_column = {}
+                    for row_id, col, value in changes:
+                        by_column.setdefault(col, []).append((row_id, value))
+                    cells = []
+                    for col, col_changes in by_column.items():
+                        row_ids = [row_id for row_id, _ in col_changes]
+                        values = [value for _, value in col_changes]
+                        if pd.api.types.is_numeric_dtype(df[col]) and not pd.api.types.is_bool_dtype(df[col]):
+                            # Keep numeric columns numeric rather than widening them to text
+                            values = numeric_table_values(col, values)
+                        old_values = [plain_value(value) for value in df[col].loc[row_ids].to_numpy()]
+                        cells.extend(zip(row_ids, [col] * len(row_ids), old_values, values))
+                    edit = {'op': 'set', 'cells': cells}
+                    apply_edit(rows, edit)
+                    df = rows.frame()
+                    stats_changes = None
+                    status_message = f"✏️ Updated {len(cells)} cells in {len({row_id for row_id, *_ in cells})} rows from the table"
+            except Exception as e:
+                edit = None
+                status_message = f"❌ Error updating table cells: {str(e)}"
+        
+        # Bulk edits of the box/lasso selection, one vectorized edit each
+        elif any(btn in trigger_id for btn in ['bulk-shift-btn', 'bulk-scale-btn', 'bulk-delete-btn']):
+            selection = live_selection(session)
+            try:
+                if len(selection) == 0:
+                    status_message = "❌ Select points with the box or lasso tool first"
+                elif 'bulk-delete-btn' in trigger_id:
+                    edit = {'op': 'delete', 'rows': df.loc[selection]}
+                    apply_edit(rows, edit)
+                    df = rows.frame()
+                    stats_changes = None
+                    status_message = f"🗑️ Removed {len(selection)} selected points. Total points: {len(df)}"
+                else:
+                    if 'bulk-shift-btn' in trigger_id:
+                        changes = [(col, delta) for col, delta in ((session['x_col'], bulk_dx), (session['y_col'], bulk_dy)) if delta]
+                        action = f"Shifted {len(selection)} selected points by ({bulk_dx or 0}, {bulk_dy or 0})"
+                    else:
+                        changes = [(session['y_col'], bulk_scale)] if bulk_scale is not None else []
+                        action = f"Scaled Y of {len(selection)} selected points by {bulk_scale}"
+                    if not changes:
+                        status_message = "❌ Enter a shift or scale factor"
+                    else:
+                        cells = []
+                        row_ids = selection.tolist()
+                        for col, amount in changes:
+                            if not pd.api.types.is_numeric_dtype(df[col]):
+                                raise ValueError(f"{col} is not numeric")
+                            old = df[col].loc[selection].to_numpy()
+                            # Float cells move from the value they print as, like a single nudge
+                            base = old.astype(str).astype(np.float64) if old.dtype.kind == 'f' else old
+                            new = base + amount if 'bulk-shift-btn' in trigger_id else base * amount
+                            if new.dtype.kind == 'f':
+                                new = round_float_noise(new)
+                            cells.extend(zip(row_ids, [col] * len(row_ids), [plain_value(value) for value in old],
+                                             [plain_value(value) for value in new]))
+                        edit = {'op': 'set', 'cells': cells}
+                        apply_edit(rows, edit)
+                        df = rows.frame()
+                        stats_changes = None
+                        status_message = f"✅ {action}"
+            except Exception as e:
+                edit = None
+                status_message = f"❌ Error editing selection: {str(e)}"
+        
+        # Handle undo/redo
+        elif 'undo-btn' in trigger_id or 'redo-btn' in trigger_id:
+            undo = 'undo-btn' in trigger_id
+            try:
+                replayed = session['edit_log'].undo(rows) if undo else session['edit_log'].redo(rows)
+                if replayed is None:
+                    status_message = "Nothing to undo" if undo else "Nothing to redo"
+                else:
+                    df = rows.frame()
+                    stats_changes = None
+                    status_message = f"{'↶ Undid' if undo else '↷ Redid'} {describe_edit(replayed)}"
+            except Exception as e:
+                replayed = None
+                status_message = f"❌ Error replaying edit: {str(e)}"
+    
+        # Persist edits (a new frame after add/remove, in-place changes otherwise)
+        replaying = ('undo-btn' in trigger_id or 'redo-btn' in trigger_id) and replayed is not None
+        if replaying or edit is not None:
+            rows_changed = edit_changes_rows(edit if edit is not None else replayed)
+            if edit is not None:
+                session['edit_log'].record(edit)
+                journal = ('edit', edit)
+            else:
+                journal = ('undo',) if 'undo-btn' in trigger_id else ('redo',)
+            session = session_store.bump_version(session_id, rows_changed=rows_changed, journal=journal,
+                                                 rows=rows, edit_log=session['edit_log'])
+            store_token = dataset_token(session)
+            # Edits to a filter column can move rows between groups - rebuild those stats
+            membership_changed = session['x_col'] in FILTER_COLUMNS or session['y_col'] in FILTER_COLUMNS
+            advance_running_stats(session, old_version, species_filter, site_filter, description_filter,
+                                  session['y_col'], None if membership_changed else stats_changes)
+            if moved_point is not None:
+                # A single nudge the plot may patch in place of a rebuild
+                store_token['nudge'] = {'from': old_version, 'row': moved_point['row'], 'axis': moved_point['axis'],
+                                        'old': json_float(moved_point['old']), 'new': json_float(moved_point['new'])}
+    
+    return status_message, store_token
+
+    
+@app.callback(
+    [Output('interactive-plot', 'figure'),
+     Output('status', 'children'),
+     Output('plot-stats', 'children')],
+    [Input('plot-btn', 'n_clicks'),
+     Input('data-store', 'data'),
+     Input('species-filter', 'value'),
+     Input('site-filter', 'value'),
+     Input('description-filter', 'value'),
+     Input('plot-viewport', 'data')],
+    [State('x-column', 'value'),
+     State('y-column', 'value'),
+     State('marker-store', 'data'),
+     State('session-id', 'data')]
+)
+def update_plot(plot_clicks, dataset, species_filter, site_filter, description_filter, viewport,
+                x_col, y_col, markers, session_id):
+    """
+    Draw the plot for the current dataset version, filters and zoom.
+    Edits arrive through the data-store and keep the status message edit_data
+    set; a single nudge is sent as a Patch when the figure in the browser
+    allows it. Markers come from the browser's marker-store, which
+    draw_markers keeps drawn between renders.
+    """
+    ctx = callback_context
+    session = session_store.get(session_id)
+    trigger_id = ctx.triggered[0]['prop_id'] if ctx.triggered else ''
+    if markers is None:
+        markers = session['markers']
+    
+    if session['df'] is None:
+        return {}, "Load data first", ""
+    
+    df = session['df']
+    status_message = dash.no_update
+    if trigger_id.startswith('data-store'):
+        # Edits redraw the plotted columns; nothing is drawn for a new upload until 'Create Plot'
+        if not session['x_col'] or not session['y_col']:
+            return {}, dash.no_update, ""
+        x_col, y_col = session['x_col'], session['y_col']
+    elif not trigger_id.startswith('plot-viewport'):
+        status_message = None  # set below from the filtered point count
+    
+    # Arrow-key nudges only patch the moved point, the mean line and the stats
+    nudge = (dataset or {}).get('nudge') if trigger_id.startswith('data-store') else None
+    if nudge is not None and dataset['version'] == session['version'] and None not in (nudge['old'], nudge['new']):
+        patched = build_nudge_patch(session_id, session, nudge['from'], nudge,
+                                    species_filter, site_filter, description_filter, x_col, y_col, len(markers))
+        if patched is not None:
+            patch, y_stats, n_filtered = patched
+            stats_panel = build_stats_panel(y_stats.mean, y_stats.std, y_stats.min, y_stats.max,
+                                            n_filtered, len(df), species_filter, site_filter, description_filter)
+            return patch, status_message, stats_panel
     
     if not x_col or not y_col:
         return {}, "Please select both X and Y columns and click 'Create Plot'", ""
     
     # Store current columns
-    data_store['x_col'] = x_col
-    data_store['y_col'] = y_col
+    if (session['x_col'], session['y_col']) != (x_col, y_col):
+        session_store.update(session_id, x_col=x_col, y_col=y_col)
+    
+    # Filtered data, sorted copy and statistics for this dataset version (memoized)
+    view = get_plot_view(session, species_filter, site_filter, description_filter, x_col, y_col)
+    filtered_df = view['filtered']
     
     # Work with filtered data for plotting
     if len(filtered_df) == 0:
         return {}, "❌ No data matches the selected filters", ""
+    if status_message is None:
+        status_message = f"Plotted {len(filtered_df)} points (filtered from {len(df)} total)"
     
     fig = go.Figure()
     
-    # Calculate statistics on filtered data
-    y_mean = filtered_df[y_col].mean()
-    y_std = filtered_df[y_col].std()
-    y_min = filtered_df[y_col].min()
-    y_max = filtered_df[y_col].max()
+    # Statistics on filtered data
+    y_mean, y_std, y_min, y_max = view['mean'], view['std'], view['min'], view['max']
     
     # Create scatter+line plot (sorted by X for proper line connection)
-    df_sorted = filtered_df.sort_values(x_col).reset_index(drop=True)
+    df_sorted = view['sorted']
+    
+    # Row positions of each trend trace, for patching nudges later
+    trend_rows = []
+    x_window = viewport_window(viewport, session, x_col)
+    
+    # Dense series: WebGL traces, with the editable points merged into the trend line
+    use_webgl = len(filtered_df) > WEBGL_THRESHOLD
+    scatter = go.Scattergl if use_webgl else go.Scatter
+    marker_size = 6 if use_webgl else 12
+    edit_hover = '<br><i>🎯 Click to select</i>' if use_webgl else ''
     
     # Color mapping for different species
     colors = ['steelblue', 'forestgreen', 'darkorange', 'purple', 'brown', 'pink', 'gray', 'olive', 'cyan']
@@ -847,96 +3233,83 @@ def update_plot(plot_clicks, update_clicks, add_clicks, remove_clicks,
     if species_filter and len(species_filter) > 1:
         # Multiple species - use different colors
         for i, species in enumerate(species_filter):
-            species_data = df_sorted[df_sorted['Sc'] == species]
+            species_data = level_of_detail(df_sorted[df_sorted['Sc'] == species], x_col, y_col, x_window)
             if len(species_data) > 0:
                 color = colors[i % len(colors)]
+                trend_rows.append(species_data.index.to_numpy())
                 
-                # Main trend line
-                fig.add_trace(go.Scatter(
-                    x=species_data[x_col],
-                    y=species_data[y_col],
+                # Main trend line (plain lists so single points can be patched)
+                fig.add_trace(scatter(
+                    x=plot_values(species_data[x_col]),
+                    y=plot_values(species_data[y_col]),
+                    customdata=species_data.index.tolist() if use_webgl else None,
                     mode='lines+markers',
                     line=dict(color=color, width=2.5),
-                    marker=dict(size=12, color=color, opacity=0.9),
+                    marker=dict(size=marker_size, color=color, opacity=0.9),
                     name=f'{species} Trend',
-                    hovertemplate=f'<b>{species}</b><br><b>{x_col}</b>: %{{x}}<br><b>{y_col}</b>: %{{y}}<extra></extra>',
+                    hovertemplate=f'<b>{species}</b><br><b>{x_col}</b>: %{{x}}<br><b>{y_col}</b>: %{{y}}{edit_hover}<extra></extra>',
                     yaxis='y'
                 ))
     elif site_filter and len(site_filter) > 1:
         # Multiple sites - use different colors
         for i, site in enumerate(site_filter):
-            site_data = df_sorted[df_sorted['SiteC'] == site]
+            site_data = level_of_detail(df_sorted[df_sorted['SiteC'] == site], x_col, y_col, x_window)
             if len(site_data) > 0:
                 color = colors[i % len(colors)]
+                trend_rows.append(site_data.index.to_numpy())
                 
-                # Main trend line
-                fig.add_trace(go.Scatter(
-                    x=site_data[x_col],
-                    y=site_data[y_col],
+                # Main trend line (plain lists so single points can be patched)
+                fig.add_trace(scatter(
+                    x=plot_values(site_data[x_col]),
+                    y=plot_values(site_data[y_col]),
+                    customdata=site_data.index.tolist() if use_webgl else None,
                     mode='lines+markers',
                     line=dict(color=color, width=2.5),
-                    marker=dict(size=12, color=color, opacity=0.9),
+                    marker=dict(size=marker_size, color=color, opacity=0.9),
                     name=f'Site {site} Trend',
-                    hovertemplate=f'<b>Site {site}</b><br><b>{x_col}</b>: %{{x}}<br><b>{y_col}</b>: %{{y}}<extra></extra>',
+                    hovertemplate=f'<b>Site {site}</b><br><b>{x_col}</b>: %{{x}}<br><b>{y_col}</b>: %{{y}}{edit_hover}<extra></extra>',
                     yaxis='y'
                 ))
     else:
         # Single species/site or no filter - use blue
-        fig.add_trace(go.Scatter(
-            x=df_sorted[x_col],
-            y=df_sorted[y_col],
+        df_sorted = level_of_detail(df_sorted, x_col, y_col, x_window)
+        trend_rows.append(df_sorted.index.to_numpy())
+        fig.add_trace(scatter(
+            x=plot_values(df_sorted[x_col]),
+            y=plot_values(df_sorted[y_col]),
+            customdata=df_sorted.index.tolist() if use_webgl else None,
             mode='lines+markers',
             line=dict(color='rgba(70, 130, 180, 0.8)', width=2.5),
-            marker=dict(size=12, color='steelblue', opacity=0.9, 
+            marker=dict(size=marker_size, color='steelblue', opacity=0.9, 
                        line=dict(width=1, color='darkblue')),
             name='Data Trend',
-            hovertemplate=f'<b>Trend Line</b><br><b>{x_col}</b>: %{{x}}<br><b>{y_col}</b>: %{{y}}<extra></extra>',
+            hovertemplate=f'<b>Trend Line</b><br><b>{x_col}</b>: %{{x}}<br><b>{y_col}</b>: %{{y}}{edit_hover}<extra></extra>',
             yaxis='y'
         ))
     
-    # Editable points overlay (maintains original indices for editing)
-    fig.add_trace(go.Scatter(
-        x=filtered_df[x_col],
-        y=filtered_df[y_col],
-        mode='markers',
-        marker=dict(size=10, color='red', opacity=0.8, 
-                   line=dict(width=2, color='darkred'),
-                   symbol='circle-open'),
-        name='Edit Points',
-        text=[f"Point {i}" for i in filtered_df.index],
-        customdata=list(filtered_df.index),
-        hovertemplate=f'<b>Editable Point %{{customdata}}</b><br><b>{x_col}</b>: %{{x}}<br><b>{y_col}</b>: %{{y}}<br><i>🎯 Click to select</i><extra></extra>',
-        yaxis='y'
-    ))
-    
-    # Add phenological marker lines
-    if data_store['markers'] and len(filtered_df) > 0:
-        for marker in data_store['markers']:
-            marker_doy = marker['doy']
-            marker_label = marker['label']
-            marker_color = marker['color']
-            
-            # Only add marker if it's within the data range
-            x_min, x_max = filtered_df[x_col].min(), filtered_df[x_col].max()
-            if x_min <= marker_doy <= x_max:
-                # Add vertical line
-                fig.add_vline(
-                    x=marker_doy,
-                    line=dict(color=marker_color, width=2, dash='dashdot'),
-                    annotation_text=marker_label,
-                    annotation_position="top",
-                    annotation_textangle=90,
-                    annotation=dict(
-                        font=dict(size=12, color=marker_color),
-                        bgcolor="rgba(255,255,255,0.8)",
-                        bordercolor=marker_color,
-                        borderwidth=1
-                    )
-                )
+    # Editable points overlay (maintains original indices for editing), only inside the zoom window
+    edit_trace = None if use_webgl else len(fig.data)
+    edit_rows = None
+    if not use_webgl:
+        overlay_df = visible_slice(view['sorted'], x_col, x_window)
+        edit_rows = overlay_df.index.to_numpy()
+        fig.add_trace(go.Scatter(
+            x=plot_values(overlay_df[x_col]),
+            y=plot_values(overlay_df[y_col]),
+            mode='markers',
+            marker=dict(size=10, color='red', opacity=0.8, 
+                       line=dict(width=2, color='darkred'),
+                       symbol='circle-open'),
+            name='Edit Points',
+            customdata=edit_rows.tolist(),
+            hovertemplate=f'<b>Editable Point %{{customdata}}</b><br><b>{x_col}</b>: %{{x}}<br><b>{y_col}</b>: %{{y}}<br><i>🎯 Click to select</i><extra></extra>',
+            yaxis='y'
+        ))
     
     # Add mean line
+    mean_traces = (len(fig.data), len(fig.data) + 1)
     fig.add_trace(go.Scatter(
-        x=[filtered_df[x_col].min(), filtered_df[x_col].max()],
+        x=[view['x_min'], view['x_max']],
         y=[y_mean, y_mean],
         mode='lines',
         line=dict(color='green', width=3, dash='dash'),
@@ -947,7 +3320,7 @@ def update_plot(plot_clicks, update_clicks, add_clicks, remove_clicks,
     
     # Add secondary axis trace (invisible)
     fig.add_trace(go.Scatter(
-        x=[filtered_df[x_col].min(), filtered_df[x_col].max()],
+        x=[view['x_min'], view['x_max']],
         y=[y_mean, y_mean],
         mode='lines',
         line=dict(color='green', width=0),
@@ -957,34 +3330,23 @@ def update_plot(plot_clicks, update_clicks, add_clicks, remove_clicks,
         hoverinfo='skip'
     ))
     
-    # Build title with filter info and markers
-    title_parts = [f'{y_col} vs {x_col} - {len(filtered_df)} points']
-    if species_filter:
-        title_parts.append(f"Species: {', '.join(species_filter)}")
-    if site_filter:
-        title_parts.append(f"Sites: {', '.join(site_filter)}")
-    if data_store['markers']:
-        title_parts.append(f"📅 {len(data_store['markers'])} markers")
-    title_parts.append(f"Mean: {y_mean:.3f}")
-    
+    marker_shapes, marker_annotations = marker_overlays(markers, view['x_min'], view['x_max'])
     fig.update_layout(
-        title=' • '.join(title_parts),
+        title=plot_title(x_col, y_col, len(filtered_df), species_filter, site_filter, len(markers), y_mean),
         xaxis_title=x_col,
         yaxis=dict(
             title=y_col,
             side='left'
         ),
-        yaxis2=dict(
-            title='Mean Level (Arbitrary Units)',
-            side='right',
-            overlaying='y',
-            range=[y_mean - abs(y_mean) * 0.1, y_mean + abs(y_mean) * 0.1],
-            tickmode='linear',
-            tick0=y_mean,
-            dtick=abs(y_mean) * 0.05 if y_mean != 0 else 0.1
-        ),
+        yaxis2=mean_axis_layout(y_mean),
+        # Phenological marker lines (replaced in the browser when markers change)
+        shapes=marker_shapes,
+        annotations=marker_annotations,
+        meta={'x_range': [view['x_min'], view['x_max']]},
         hovermode='closest',
         height=600,
+        # Keep the user's zoom across re-renders of the same dataset and axes
+        uirevision=f"{session['dataset_id']}:{x_col}:{y_col}",
         clickmode='event+select',
         legend=dict(
             x=0.02,
@@ -995,34 +3357,13 @@ def update_plot(plot_clicks, update_clicks, add_clicks, remove_clicks,
         )
     )
     
-    # Create statistics panel
-    filter_info = ""
-    if species_filter or site_filter or description_filter:
-        filter_parts = []
-        if species_filter:
-            filter_parts.append(f"Species: {', '.join(species_filter)}")
-        if site_filter:
-            filter_parts.append(f"Sites: {', '.join(site_filter)}")
-        if description_filter:
-            filter_parts.append(f"Desc: {', '.join(description_filter)}")
-        filter_info = f" ({' | '.join(filter_parts)})"
+    # Remember where each row was drawn so the next nudge can be patched
+    filters = filters_key(species_filter, site_filter, description_filter)
+    figure_maps.put(session_id, build_figure_map(session, view, filters, x_col, y_col,
+                                                 trend_rows, edit_trace, edit_rows, mean_traces))
     
-    stats_panel = html.Div([
-        html.H5(f"📊 Statistics{filter_info}", style={'marginBottom': '10px', 'color': '#495057'}),
-        html.Div([
-            html.Span(f"Mean: ", style={'fontWeight': 'bold'}),
-            html.Span(f"{y_mean:.4f}", style={'color': 'green', 'fontWeight': 'bold', 'fontSize': '16px'}),
-            html.Span(" | ", style={'margin': '0 10px', 'color': '#6c757d'}),
-            html.Span(f"Std: ", style={'fontWeight': 'bold'}),
-            html.Span(f"{y_std:.4f}", style={'color': '#007bff'}),
-            html.Span(" | ", style={'margin': '0 10px', 'color': '#6c757d'}),
-            html.Span(f"Range: ", style={'fontWeight': 'bold'}),
-            html.Span(f"{y_min:.3f} - {y_max:.3f}", style={'color': '#6f42c1'}),
-            html.Span(" | ", style={'margin': '0 10px', 'color': '#6c757d'}),
-            html.Span(f"Filtered: ", style={'fontWeight': 'bold'}),
-            html.Span(f"{len(filtered_df)}/{len(df)}", style={'color': '#dc3545', 'fontWeight': 'bold', 'fontSize': '16px'}),
-        ])
-    ])
+    stats_panel = build_stats_panel(y_mean, y_std, y_min, y_max, len(filtered_df), len(df),
+                                    species_filter, site_filter, description_filter)
     
     return fig, status_message, stats_panel
 
@@ -1031,41 +3372,36 @@ def update_plot(plot_clicks, update_clicks, add_clicks, remove_clicks,
      Output('new-x-value', 'value'),
      Output('new-y-value', 'value')],
     [Input('interactive-plot', 'clickData'),
-     Input('remove-point-btn', 'n_clicks'),
-     Input('x-minus-btn', 'n_clicks'),
-     Input('x-plus-btn', 'n_clicks'),
-     Input('y-minus-btn', 'n_clicks'),
-     Input('y-plus-btn', 'n_clicks')],
+     Input('data-store', 'data')],
     [State('x-column', 'value'),
      State('y-column', 'value'),
      State('selected-point', 'children'),
-     State('step-size', 'value')],
+     State('session-id', 'data')],
     prevent_initial_call=True  # ← Add this line
 )
-def select_point(clickData, remove_clicks, x_minus_clicks, x_plus_clicks, y_minus_clicks, y_plus_clicks, x_col, y_col, selected_point, step_size):
+def select_point(clickData, dataset, x_col, y_col, selected_point, session_id):
     ctx = callback_context
+    session = session_store.get(session_id)
     
-    # If remove button was clicked, clear selection
-    if ctx.triggered and 'remove-point-btn' in ctx.triggered[0]['prop_id']:
-        return "None", "", ""  # ← Changed None to ""
-    
-    # Handle fine-tuning buttons - update the input values to reflect changes
-    if ctx.triggered and selected_point != "None" and data_store['df'] is not None:
-        trigger_id = ctx.triggered[0]['prop_id']
-        if any(btn in trigger_id for btn in ['x-minus-btn', 'x-plus-btn', 'y-minus-btn', 'y-plus-btn']):
-            try:
-                point_idx = int(selected_point)
-                df = data_store['df']
-                
-                # Get updated values after button press
-                current_x = df.iloc[point_idx][data_store['x_col']]
-                current_y = df.iloc[point_idx][data_store['y_col']]
-                
-                return selected_point, current_x, current_y
-            except:
-                pass
+    # After an edit, refresh the selected point's values (or drop it once it is removed)
+    if ctx.triggered and 'data-store' in ctx.triggered[0]['prop_id']:
+        if selected_point == "None" or session['df'] is None:
+            return dash.no_update, dash.no_update, dash.no_update
+        try:
+            point_idx = int(selected_point)
+            if point_idx not in session['rows']:
+                return "None", "", ""
+            df = session['df']
+            
+            # Get updated values after button press
+            current_x = plain_value(df.at[point_idx, session['x_col']])
+            current_y = plain_value(df.at[point_idx, session['y_col']])
+            
+            return selected_point, current_x, current_y
+        except:
+            return dash.no_update, dash.no_update, dash.no_update
     
-    if clickData is None or data_store['df'] is None:
+    if clickData is None or session['df'] is None:
         return "None", "", ""  # ← Changed None to ""
     
     # Get the clicked point - check if it's from the editable points trace
@@ -1076,18 +3412,46 @@ def select_point(clickData, remove_clicks, x_minus_clicks, x_plus_clicks, y_minu
         return "None", "", ""  # ← Changed None to ""
         
     point_idx = clicked_point['customdata']
-    df = data_store['df']
+    df = session['df']
     
-    # Check if point index is still valid (in case points were removed)
-    if point_idx >= len(df):
+    # Check if the row still exists (in case points were removed)
+    if point_idx not in session['rows']:
         return "None", "", ""  # ← Changed None to ""
     
     # Get current values
-    current_x = df.iloc[point_idx][x_col] if x_col else ""  # ← Changed None to ""
-    current_y = df.iloc[point_idx][y_col] if y_col else ""  # ← Changed None to ""
+    current_x = plain_value(df.at[point_idx, x_col]) if x_col else ""  # ← Changed None to ""
+    current_y = plain_value(df.at[point_idx, y_col]) if y_col else ""  # ← Changed None to ""
     
     return str(point_idx), current_x, current_y
 
+@app.callback(
+    Output('selection-status', 'children'),
+    [Input('interactive-plot', 'selectedData'),
+     Input('data-store', 'data')],
+    [State('species-filter', 'value'),
+     State('site-filter', 'value'),
+     State('description-filter', 'value'),
+     State('session-id', 'data')],
+    prevent_initial_call=True
+)
+def select_points(selected_data, dataset, species_filter, site_filter, description_filter, session_id):
+    ctx = callback_context
+    session = session_store.get(session_id)
+    if session['df'] is None or not session['x_col'] or not session['y_col']:
+        return "No points selected"
+    
+    # A new box/lasso selection (or a click) replaces the stored one; edits only recount it
+    if ctx.triggered and 'selectedData' in ctx.triggered[0]['prop_id']:
+        view = get_filtered_view(session, species_filter, site_filter, description_filter)
+        selection = rows_in_selection(view, session['x_col'], session['y_col'], selected_data)
+        session_store.update(session_id, selection=selection)
+    else:
+        selection = live_selection(session)
+    
+    if len(selection) == 0:
+        return "No points selected"
+    return f"{len(selection)} points selected"
+
 @app.callback(
     [Output('add-point-status', 'children'),
      Output('add-x-value', 'value'),
@@ -1103,76 +3467,223 @@ def clear_add_inputs(n_clicks, add_x, add_y):
     return "⚠️ Please enter both X and Y values", "", ""  # ← Changed None to ""
 
 @app.callback(
-    Output('data-table', 'children'),
-    [Input('data-store', 'children'),
-     Input('update-point-btn', 'n_clicks'),
-     Input('add-point-btn', 'n_clicks'),
-     Input('remove-point-btn', 'n_clicks'),
-     Input('x-minus-btn', 'n_clicks'),
-     Input('x-plus-btn', 'n_clicks'),
-     Input('y-minus-btn', 'n_clicks'),
-     Input('y-plus-btn', 'n_clicks'),
+    [Output('data-table', 'data'),
+     Output('data-table', 'columns'),
+     Output('data-table', 'page_count'),
+     Output('data-table', 'page_current'),
+     Output('data-table-title', 'children')],
+    [Input('data-store', 'data'),
      Input('species-filter', 'value'),
      Input('site-filter', 'value'),
-     Input('description-filter', 'value')]
+     Input('description-filter', 'value'),
+     Input('data-table', 'page_current'),
+     Input('data-table', 'page_size'),
+     Input('data-table', 'sort_by'),
+     Input('data-table', 'filter_query')],
+    [State('data-table', 'columns'),
+     State('session-id', 'data')]
 )
-def update_table(data, update_clicks, add_clicks, remove_clicks, x_minus_clicks, x_plus_clicks, y_minus_clicks, y_plus_clicks, species_filter, site_filter, description_filter):
-    if data_store['df'] is None:
-        return ""
-    
-    df = data_store['df']
-    
-    # Apply filters to table display
-    filtered_df = apply_filters(df, species_filter, site_filter, description_filter)
-    
-    # Show more data for better preview
-    display_rows = min(20, len(filtered_df))
-    
-    table_title = f"Data Preview (Showing {display_rows} of {len(filtered_df)} filtered rows"
-    if len(filtered_df) < len(df):
+def update_table(dataset, species_filter, site_filter, description_filter, page_current, page_size, sort_by,
+                 filter_query, columns, session_id):
+    # dataset carries only the dataset id and edit version; it changes after every edit
+    session = session_store.get(session_id)
+    if session['df'] is None:
+        return [], [], 1, 0, ""
+    
+    df = session['df']
+    
+    # Filters of the controls above plus the table's own filter row and sort order
+    table_df = get_table_view(session, species_filter, site_filter, description_filter, sort_by, filter_query)
+    
+    # Only the requested page is turned into records
+    page_size = page_size or TABLE_PAGE_SIZE
+    page_count = max(math.ceil(len(table_df) / page_size), 1)
+    page = min(page_current or 0, page_count - 1)
+    page_df = table_df.iloc[page * page_size:(page + 1) * page_size]
+    
+    table_title = f"Data Preview (Showing rows {page * page_size + min(len(page_df), 1)}-{page * page_size + len(page_df)} of {len(table_df)} filtered rows"
+    if len(table_df) < len(df):
         table_title += f" from {len(df)} total)"
     else:
         table_title += ")"
     
-    return html.Div([
-        html.H5(table_title, style={'marginBottom': 10}),
-        dash_table.DataTable(
-            data=filtered_df.head(20).to_dict('records'),
-            columns=[{"name": i, "id": i} for i in filtered_df.columns],
-            style_cell={'textAlign': 'left', 'fontSize': 11, 'padding': '4px'},
-            style_header={'backgroundColor': 'rgb(230, 230, 230)', 'fontWeight': 'bold', 'fontSize': 12},
-            style_data_conditional=[
-                {
-                    'if': {'row_index': 'odd'},
-                    'backgroundColor': 'rgb(248, 248, 248)'
-                }
-            ],
-            page_size=20
-        )
-    ])
+    # Header cells are only re-sent for a dataset with other columns; numeric cells reject text in the browser
+    # (and edit_data checks again), clearing a cell stores NaN
+    table_columns = [{'name': col, 'id': col, 'type': 'numeric',
+                      'on_change': {'action': 'coerce', 'failure': 'reject'}, 'validation': {'allow_null': True}}
+                     if pd.api.types.is_numeric_dtype(df[col]) else {'name': col, 'id': col, 'type': 'text'}
+                     for col in df.columns]
+    # 'id' is the DataTable row id: edited cells are written back by row ID
+    records = display_records(page_df)
+    for record, row_id in zip(records, page_df.index.tolist()):
+        record['id'] = row_id
+    return (records, table_columns if table_columns != columns else dash.no_update,
+            page_count, page if page != page_current else dash.no_update, table_title)
 
 @app.callback(
-    Output("download-data", "data"), 
-    [Input("download-btn", "n_clicks")],
+    [Output('export-url', 'data'),
+     Output('export-status', 'children')],
+    [Input('download-btn', 'n_clicks')],
+    [State('export-format', 'value'),
+     State('export-compression', 'value'),
+     State('export-scope', 'value'),
+     State('species-filter', 'value'),
+     State('site-filter', 'value'),
+     State('description-filter', 'value'),
+     State('session-id', 'data')],
     prevent_initial_call=True,
 )
 
-def download_data(n_clicks):
-    if data_store['df'] is not None:
-        return dcc.send_data_frame(data_store['df'].to_csv, "modified_data.DOY", sep='\t', index=False)
+def download_data(n_clicks, fmt, compression, scope, species_filter, site_filter, description_filter, session_id):
+    # The file itself is streamed by export_data; this only checks the options and points the browser there
+    session = session_store.get(session_id)
+    if session['df'] is None:
+        return dash.no_update, "No data to download"
+    error = export_error(fmt, compression)
+    if error:
+        return dash.no_update, f"❌ {error}"
+    scope = scope or []
+    if fmt == 'patch':
+        status = "⬇️ Downloading the changes since loading as a patch"
+    else:
+        n_rows = len(export_frame(session, scope, species_filter, site_filter, description_filter))
+        status = f"⬇️ Downloading {n_rows} rows as {fmt.upper()}"
+    query = urlencode({'format': fmt, 'compression': compression, 'scope': ','.join(scope),
+                       'filters': json.dumps([species_filter, site_filter, description_filter])})
+    url = app.get_relative_path(f'/export/{session_id}') + '?' + query
+    return {'url': url, 'clicks': n_clicks}, status
+
+@server.route('/export/<session_id>')
+def export_data(session_id):
+    """Stream the session's data as a file download (see download_data for the options)"""
+    args = flask.request.args
+    fmt, compression = args.get('format', 'tsv'), args.get('compression', 'none')
+    session = session_store.get(session_id)
+    if session['df'] is None or export_error(fmt, compression):
+        flask.abort(404)
+    extension, mimetype = EXPORT_FORMATS[fmt]
+    if fmt in ('tsv', 'csv', 'patch'):
+        extension += EXPORT_COMPRESSION_SUFFIXES[compression]
+    if fmt == 'patch':
+        # Small by design: the whole patch is encoded at once, scope and filters do not apply
+        patch = diff_frames(original_frame(session), session['df'], session['source_key'])
+        body = compress_stream([json.dumps(patch).encode('utf-8')], compression)
+    else:
+        scope = [part for part in args.get('scope', '').split(',') if part]
+        species_filter, site_filter, description_filter = json.loads(args.get('filters', '[null, null, null]'))
+        body = export_chunks(export_frame(session, scope, species_filter, site_filter, description_filter),
+                             fmt, compression)
+    # Encode the first slice before the response starts, so a failure is an error status, not a truncated file
+    body = itertools.chain([next(body)], body)
+    return flask.Response(body, mimetype=mimetype,
+                          headers={'Content-Disposition': f'attachment; filename="modified_data{extension}"'})
+
+app.clientside_callback(
+    """
+    function(exportUrl) {
+        // Let the browser fetch the export itself, so the file never passes through a callback response
+        if (exportUrl) {
+            const link = document.createElement('a');
+            link.href = exportUrl.url;
+            link.download = '';
+            document.body.appendChild(link);
+            link.click();
+            link.remove();
+        }
+        return window.dash_clientside.no_update;
+    }
+    """,
+    Output('export-url', 'clear_data'),
+    Input('export-url', 'data')
+)
 
 @app.callback(
     [Output('upload-status', 'children', allow_duplicate=True),
-     Output('interactive-plot', 'figure', allow_duplicate=True)],
+     Output('data-store', 'data', allow_duplicate=True)],
     [Input('reset-btn', 'n_clicks')],
+    [State('session-id', 'data')],
+    prevent_initial_call=True
+)
+@with_session_lock
+def reset_data(n_clicks, session_id):
+    session = session_store.get(session_id)
+    if session['df'] is not None:
+        # Reset is undo of every edit: reload the cached upload if there is one, otherwise
+        # unwind the log. Either way the edits stay on the redo stack.
+        edit_log = session['edit_log']
+        original_df = load_original(session)
+        if original_df is not None:
+            rows = RowBuffer(original_df, next_id=session['rows'].next_id)
+            edit_log.undo_all()
+        else:
+            rows = session['rows']
+            edit_log.undo_all(rows)
+        session = session_store.bump_version(session_id, rows_changed=True, journal=('reset',),
+                                             rows=rows, edit_log=edit_log)
+        return "Data reset to original values", dataset_token(session)
+    return "No original data to reset", dash.no_update
+
+@app.callback(
+    [Output('upload-status', 'children', allow_duplicate=True),
+     Output('data-store', 'data', allow_duplicate=True)],
+    [Input('patch-upload', 'contents')],
+    [State('session-id', 'data')],
     prevent_initial_call=True
 )
+@with_session_lock
+def import_patch(contents, session_id):
+    session = session_store.get(session_id)
+    if contents is None:
+        return dash.no_update, dash.no_update
+    if session['df'] is None:
+        return "❌ Load the patch's source file first", dash.no_update
+    
+    # The patch replaces any edits: it is applied to a fresh copy of the source, one undoable edit per part
+    try:
+        patch = json.loads(decompress_upload(base64.b64decode(contents[contents.index(',') + 1:])))
+        if patch.get('source_key') not in (None, session['source_key']):
+            raise ValueError("the patch was made from a different file")
+        original = original_frame(session)
+        rows, edit_log = RowBuffer(original), EditLog()
+        for entry in patch_edits(original, patch):
+            apply_edit(rows, entry)
+            edit_log.record(entry)
+    except Exception as e:
+        return f"❌ Error applying patch: {str(e)}", dash.no_update
+    
+    session = session_store.bump_version(session_id, rows_changed=True, rows=rows, edit_log=edit_log,
+                                         dataset_id=uuid.uuid4().hex, selection=None)
+    edit_journal.start(session_id, session)
+    n_cells = sum(len(change['ids']) for change in patch['modified'].values())
+    return (f"✅ Applied patch: {n_cells} cells changed, {len(patch['added']['ids'])} rows added, "
+            f"{len(patch['removed'])} rows removed", dataset_token(session))
+app.clientside_callback(
+    """
+    function(relayoutData, dataset, xCol) {
+        // Track the visible X range; autorange (double click) clears it
+        const noUpdate = window.dash_clientside.no_update;
+        if (!relayoutData || !dataset) {
+            return noUpdate;
+        }
+        if (relayoutData['xaxis.autorange']) {
+            return null;
+        }
+        let range = relayoutData['xaxis.range'];
+        if ('xaxis.range[0]' in relayoutData) {
+            range = [relayoutData['xaxis.range[0]'], relayoutData['xaxis.range[1]']];
+        }
+        if (!range) {
+            return noUpdate;
+        }
+        return {dataset: dataset.dataset, x_col: xCol, range: range};
+    }
+    """,
+    Output('plot-viewport', 'data'),
+    Input('interactive-plot', 'relayoutData'),
+    State('data-store', 'data'),
+    State('x-column', 'value')
+)
 
-def reset_data(n_clicks):
-    if data_store['original_df'] is not None:
-        data_store['df'] = data_store['original_df'].copy()
-        return "Data reset to original values", {}
-    return "No original data to reset", {}
 app.clientside_callback(
     """
     function(n_intervals) {
@@ -1181,19 +3692,18 @@ app.clientside_callback(
                 return;
             }
             
-            if (['ArrowLeft', 'ArrowRight', 'ArrowUp', 'ArrowDown'].includes(event.key)) {
+            if ((event.ctrlKey || event.metaKey) && ['z', 'Z', 'y', 'Y'].includes(event.key)) {
                 event.preventDefault();
-                
-                let buttonId = '';
-                switch(event.key) {
-                    case 'ArrowLeft': buttonId = 'x-minus-btn'; break;
-                    case 'ArrowRight': buttonId = 'x-plus-btn'; break;
-                    case 'ArrowDown': buttonId = 'y-minus-btn'; break;
-                    case 'ArrowUp': buttonId = 'y-plus-btn'; break;
-                }
-                
-                const button = document.getElementById(buttonId);
+                const redo = event.key.toLowerCase() === 'y' || event.shiftKey;
+                const button = document.getElementById(redo ? 'redo-btn' : 'undo-btn');
                 if (button) button.click();
+                return;
+            }
+            
+            if (['ArrowLeft', 'ArrowRight', 'ArrowUp', 'ArrowDown'].includes(event.key)) {
+                event.preventDefault();
+                // Moved in the browser right away by provisional_nudge, saved in batches
+                window.dash_clientside.set_props('nudge-keys', {data: {key: event.key, time: Date.now()}});
             }
         });
         return '';
@@ -1203,6 +3713,64 @@ app.clientside_callback(
     Input('keyboard-listener', 'id')
 )
 
+app.clientside_callback(
+    """
+    function(keys, figure, selectedPoint, stepSize, xCol) {
+        // Move the selected point in the figure now; send the summed move to edit_data
+        // (via nudge-commit) once the keys pause, or right away when another point is moved
+        const noUpdate = window.dash_clientside.no_update;
+        if (!keys || selectedPoint === 'None' || stepSize === null || stepSize === undefined || !figure || !figure.data) {
+            return noUpdate;
+        }
+        const row = parseInt(selectedPoint, 10);
+        // Same steps as x_step on the server
+        const xStep = (xCol === 'DOY' || (xCol || '').toLowerCase().includes('date')) ? 1 : stepSize;
+        const dx = {ArrowLeft: -xStep, ArrowRight: xStep}[keys.key] || 0;
+        const dy = {ArrowDown: -stepSize, ArrowUp: stepSize}[keys.key] || 0;
+        
+        const commit = function(move) {
+            window.dash_clientside.set_props('nudge-commit', {data: {row: move.row, dx: move.dx, dy: move.dy}});
+        };
+        let pending = window.chartsEditNudge;
+        if (pending && pending.row !== row) {
+            clearTimeout(pending.timer);
+            commit(pending);
+            pending = null;
+        }
+        if (!pending) {
+            pending = window.chartsEditNudge = {row: row, dx: 0, dy: 0, timer: null};
+        }
+        pending.dx += dx;
+        pending.dy += dy;
+        clearTimeout(pending.timer);
+        pending.timer = setTimeout(function() {
+            window.chartsEditNudge = null;
+            commit(pending);
+        }, %d);
+        
+        // Traces with row IDs in customdata hold the point ("Edit Points", WebGL trend lines)
+        const data = figure.data.map(function(trace) {
+            const pos = Array.isArray(trace.customdata) ? trace.customdata.indexOf(row) : -1;
+            if (pos < 0) {
+                return trace;
+            }
+            const moved = Object.assign({}, trace, {x: trace.x.slice(), y: trace.y.slice()});
+            moved.x[pos] += dx;
+            moved.y[pos] += dy;
+            return moved;
+        });
+        return Object.assign({}, figure, {data: data});
+    }
+    """ % NUDGE_COMMIT_DELAY_MS,
+    Output('interactive-plot', 'figure', allow_duplicate=True),
+    Input('nudge-keys', 'data'),
+    [State('interactive-plot', 'figure'),
+     State('selected-point', 'children'),
+     State('step-size', 'value'),
+     State('x-column', 'value')],
+    prevent_initial_call=True
+)
+
 if __name__ == '__main__':
     print("Starting FM-Trace Data Editor...")
     print("Open your browser and go to: http://127.0.0.1:8050")
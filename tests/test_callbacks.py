@@ -0,0 +1,85 @@
+import base64
+import uuid
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import charts_edit as ce
+
+
+@pytest.fixture(scope='module')
+def client():
+    client = ce.server.test_client()
+    client.get('/')
+    return client
+
+
+def call(client, output, values, triggered):
+    """Run the callback whose output spec contains output, as the browser would for the triggered props"""
+    spec = next(dep for dep in client.get('/_dash-dependencies').get_json() if output in dep['output'])
+
+    def props(items):
+        return [{'id': item['id'], 'property': item['property'], 'value': values.get(item['id'])} for item in items]
+
+    outputs = []
+    for part in spec['output'].strip('.').split('...'):
+        component, prop = part.rsplit('.', 1)
+        outputs.append({'id': component, 'property': prop.split('@')[0]})
+    return client.post('/_dash-update-component', json={
+        'output': spec['output'], 'outputs': outputs, 'inputs': props(spec['inputs']),
+        'state': props(spec['state']), 'changedPropIds': triggered})
+
+
+@pytest.fixture
+def session_id():
+    session_id = uuid.uuid4().hex
+    df = pd.DataFrame({'Sc': pd.Categorical(['oak'] * 4), 'SiteC': pd.Categorical(['A'] * 4),
+                       'DOY': np.arange(100, 104, dtype=np.int16),
+                       'leaf_mass': np.array([0.1, 0.2, 0.3, 0.4], dtype=np.float32)})
+    ce.session_store.bump_version(session_id, rows_changed=True, rows=ce.RowBuffer(df), edit_log=ce.EditLog(),
+                                  dataset_id=uuid.uuid4().hex, x_col=None, y_col=None)
+    yield session_id
+    ce.session_store.delete(session_id)
+
+
+@pytest.mark.parametrize('button', ['x-plus-btn', 'y-minus-btn'])
+def test_step_button_before_the_plot_is_created(client, session_id, button):
+    # A new upload resets the plot columns while the old point may still be selected
+    response = call(client, '..status.children@', {'session-id': session_id, 'selected-point': '2',
+                                                   'step-size': 0.1, button: 1}, [f'{button}.n_clicks'])
+    assert response.status_code == 200
+    assert 'Create a plot' in response.get_json()['response']['status']['children']
+    assert ce.session_store.get(session_id)['df']['leaf_mass'].tolist() == pytest.approx([0.1, 0.2, 0.3, 0.4])
+
+
+class RecordingDict(dict):
+    def __init__(self):
+        super().__init__()
+        self.history = []
+
+    def __setitem__(self, key, value):
+        self.history.append(value)
+        super().__setitem__(key, value)
+
+
+def test_large_upload_reports_parse_progress(client, monkeypatch):
+    monkeypatch.setattr(ce, 'STREAM_THRESHOLD_BYTES', 0)
+    monkeypatch.setattr(ce, 'PARSE_CHUNK_ROWS', 10)
+    monkeypatch.setattr(ce, 'upload_progress', RecordingDict())
+    session_id = uuid.uuid4().hex
+    # Unique contents, so the upload is never served from the parse cache
+    text = f'Sc\tSiteC\tDOY\t{session_id}\n' + ''.join(f'oak\tA\t{100 + i}\t0.{i % 10}\n' for i in range(25))
+    contents = 'data:text/plain;base64,' + base64.b64encode(text.encode()).decode()
+    try:
+        response = call(client, 'upload-status.children', {'upload-data': contents, 'session-id': session_id},
+                        ['upload-data.contents'])
+        assert response.status_code == 200
+        body = response.get_json()
+        assert 'Successfully loaded 25 rows' in body['response']['upload-status']['children']
+        assert body['sideUpdate']['upload-progress-poll'] == {'disabled': True}
+        assert [line.split(' rows')[0] for line in ce.upload_progress.history[1:]] == [
+            '⏳ Parsed 10', '⏳ Parsed 20', '⏳ Parsed 25']
+        assert session_id not in ce.upload_progress
+    finally:
+        ce.session_store.delete(session_id)
@@ -0,0 +1,59 @@
+import gzip
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import charts_edit as ce
+
+pa = pytest.importorskip('pyarrow')
+
+
+def make_frame(n=25):
+    return pd.DataFrame({
+        'Sc': pd.Categorical(['oak', 'pine', 'elm'] * (n // 3) + ['oak'] * (n % 3)),
+        'DOY': np.arange(100, 100 + n, dtype=np.int16),
+        'leaf_mass': np.round(np.linspace(0.5, 1.2, n), 2).astype(np.float32),
+        'Note': pd.Series([None if i % 4 == 0 else f'note {i}' for i in range(n)], dtype=object),
+    })
+
+
+def read_back(data, fmt):
+    if fmt == 'parquet':
+        return pd.read_parquet(io.BytesIO(data))
+    if fmt == 'feather':
+        return pa.ipc.open_file(pa.BufferReader(data)).read_pandas()
+    return pd.read_csv(io.BytesIO(data), sep='\t' if fmt == 'tsv' else ',')
+
+
+@pytest.mark.parametrize('fmt, compression', [('tsv', 'none'), ('csv', 'gzip'), ('parquet', 'none'),
+                                              ('parquet', 'gzip'), ('feather', 'none')])
+def test_export_with_text_column_reads_back(monkeypatch, fmt, compression):
+    monkeypatch.setattr(ce, 'EXPORT_CHUNK_ROWS', 10)  # several slices per export
+    df = make_frame()
+    data = b''.join(ce.export_chunks(df, fmt, compression))
+    if fmt in ('tsv', 'csv') and compression == 'gzip':
+        data = gzip.decompress(data)
+    out = read_back(data, fmt)
+    assert list(out.columns) == list(df.columns)
+    assert [None if pd.isna(value) else value for value in out['Note']] == df['Note'].tolist()
+    assert out['Sc'].astype(str).tolist() == df['Sc'].astype(str).tolist()
+    np.testing.assert_allclose(out['leaf_mass'].to_numpy(dtype=np.float64), df['leaf_mass'].to_numpy(), rtol=1e-6)
+    assert out['DOY'].tolist() == df['DOY'].tolist()
+
+
+def test_export_schema_declares_text_columns_as_strings():
+    schema = ce.export_schema(make_frame())
+    assert schema.field('Note').type == pa.string()
+
+
+def test_export_route_streams_a_complete_parquet_file():
+    df = make_frame()
+    ce.session_store.bump_version('export-test', rows=ce.RowBuffer(df), edit_log=ce.EditLog(), source_key=None)
+    try:
+        response = ce.server.test_client().get('/export/export-test?format=parquet&compression=none')
+        assert response.status_code == 200
+        assert read_back(response.get_data(), 'parquet')['Note'].notna().sum() == df['Note'].notna().sum()
+    finally:
+        ce.session_store.delete('export-test')
@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import charts_edit as ce
+
+
+def make_frame(n=200, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'Sc': pd.Categorical(rng.choice(['oak', 'pine', 'elm'], n)),
+        'SiteC': pd.Categorical(rng.choice(['A', 'B', 'C', 'D'], n)),
+        'Description': pd.Categorical(rng.choice(['leaf', 'bud'], n)),
+        'DOY': rng.integers(1, 365, n).astype(np.int16),
+        'leaf_mass': np.round(rng.random(n), 2).astype(np.float32),
+    })
+    df.loc[::17, 'SiteC'] = np.nan
+    return df
+
+
+@pytest.mark.parametrize('filters', [
+    [('Sc', ['oak'])],
+    [('Sc', ['oak', 'pine', 'oak'])],
+    [('Sc', ['oak']), ('SiteC', ['B', 'C'])],
+    [('Sc', ['pine']), ('SiteC', ['A']), ('Description', ['bud'])],
+    [('Sc', ['birch'])],
+    [('Sc', ['oak']), ('SiteC', ['nowhere'])],
+])
+def test_filter_index_rows_match_column_scan(filters):
+    df = make_frame()
+    expected = np.ones(len(df), dtype=bool)
+    for col, values in filters:
+        expected &= df[col].isin(values).to_numpy()
+    rows = ce.FilterIndex(df).rows(filters)
+    assert np.array_equal(rows, np.flatnonzero(expected))
+
+
+def test_filter_index_without_active_filters_selects_every_row():
+    assert ce.FilterIndex(make_frame()).rows([('Sc', None), ('SiteC', [])]) is None
+
+
+def test_apply_filters_with_index_matches_scan():
+    df = make_frame()
+    index = ce.FilterIndex(df)
+    indexed = ce.apply_filters(df, ['elm', 'oak'], ['D'], None, index)
+    scanned = ce.apply_filters(df, ['elm', 'oak'], ['D'], None)
+    pd.testing.assert_frame_equal(indexed, scanned)
+
+
+def test_sorted_intersection():
+    a = np.array([1, 4, 6, 9, 12])
+    assert ce.sorted_intersection(a, np.array([0, 4, 5, 12, 20])).tolist() == [4, 12]
+    assert ce.sorted_intersection(np.array([13, 14]), a).tolist() == []
+    assert ce.sorted_intersection(a, np.empty(0, dtype=np.intp)).tolist() == []
+
+
+def table_rows(df, filter_query):
+    return np.flatnonzero(ce.table_filter_mask(df, ce.parse_table_filter(filter_query))).tolist()
+
+
+@pytest.mark.parametrize('filter_query, expected', [
+    ('{DOY} contains 10', [0, 1, 3]),  # matched as text, not as 10.0
+    ('{DOY} contains 1', [0, 1, 2, 3]),
+    ('{DOY} = 10', [1]),
+    ('{DOY} = "10"', [1]),
+    ('{DOY} > 5', [0, 1, 3]),
+    ('{DOY} >= 10 && {DOY} < 101', [0, 1]),
+    ('{DOY} = oak', []),
+    ('{leaf_mass} = 0.3', [2]),  # float32 cell equals the value it prints as
+    ('{Sc} = 10', [3]),
+    ('{Sc} icontains OA', [0]),
+    ('{Sc} is blank', [2]),
+    ('{DOY} is not num', []),
+    ('{DOY} is even', [0, 1, 3]),
+    ('{nowhere} = 1', [0, 1, 2, 3]),
+    ('{DOY} ~ 1', []),
+])
+def test_table_filter_mask(filter_query, expected):
+    df = pd.DataFrame({
+        'Sc': pd.Categorical(['oak', 'pine', None, '10']),
+        'DOY': np.array([100, 10, 1, 104], dtype=np.int16),
+        'leaf_mass': np.array([0.1, 0.2, 0.3, 0.4], dtype=np.float32),
+    })
+    assert table_rows(df, filter_query) == expected
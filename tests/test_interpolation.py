@@ -0,0 +1,82 @@
+import uuid
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import charts_edit as ce
+
+
+def make_frame():
+    return pd.DataFrame({
+        'Sc': pd.Categorical(['oak', 'oak', 'pine', 'oak', 'pine', 'oak']),
+        'SiteC': pd.Categorical(['A', 'B', 'A', 'A', 'A', 'A']),
+        'DOY': np.array([130, 100, 120, 110, 100, 90], dtype=np.int16),
+        'leaf_mass': np.array([0.9, 0.1, 0.5, 0.7, 0.3, 0.5], dtype=np.float32),
+    })
+
+
+@pytest.mark.parametrize('species, site, expected', [
+    (['oak'], ['A'], [5, 3, 0]),
+    (['oak'], None, [5, 1, 3, 0]),
+    (['oak'], ['C'], [5, 1, 3, 0]),  # no oak at C: fall back to every oak
+    (['birch'], ['A'], [5, 4, 3, 2, 0]),  # no birch: every row at A
+    (['oak', 'pine'], None, [5, 1, 4, 3, 2, 0]),  # several species: every row
+])
+def test_interpolation_order(species, site, expected):
+    df = make_frame()
+    assert ce.interpolation_order(df, 'DOY', species, site).tolist() == expected
+    assert ce.interpolation_order(df, 'DOY', species, site, ce.FilterIndex(df)).tolist() == expected
+
+
+def test_interpolate_rows_blends_neighbours():
+    df = make_frame()
+    order = ce.interpolation_order(df, 'DOY', ['oak'], ['A'])
+    rows = ce.interpolate_rows(df, [100, 80, 140], None, 'DOY', 'leaf_mass', order, {'Sc': 'oak', 'SiteC': 'A'})
+    assert rows['leaf_mass'].tolist() == pytest.approx([0.6, 0.5, 0.9])
+    assert rows['Sc'].tolist() == ['oak'] * 3
+
+
+def session_for(df):
+    session = ce.new_session_state()
+    session.update(rows=ce.RowBuffer(df), edit_log=ce.EditLog(), dataset_id=uuid.uuid4().hex)  # views are cached by dataset ID
+    return ce.sync_frame(session)
+
+
+def test_fill_gaps_fills_each_group_from_its_own_rows():
+    df = make_frame()
+    rows, counts = ce.fill_gaps(session_for(df), 'DOY', 'leaf_mass', 10, None, None, None)
+    assert counts == [(('oak', 'A'), 2), (('oak', 'B'), 0), (('pine', 'A'), 1)]
+    assert rows[['Sc', 'SiteC', 'DOY']].values.tolist() == [['oak', 'A', 100], ['oak', 'A', 120], ['pine', 'A', 110]]
+    assert rows['leaf_mass'].tolist() == pytest.approx([0.6, 0.8, 0.4])
+
+
+def test_fill_gaps_matches_per_group_interpolation_order():
+    rng = np.random.default_rng(1)
+    n = 2000
+    df = pd.DataFrame({
+        'Sc': pd.Categorical(rng.choice(['oak', 'pine', 'elm'], n)),
+        'SiteC': pd.Categorical(rng.choice(['A', 'B'], n)),
+        'DOY': rng.integers(1, 400, n).astype(np.int16),
+        'leaf_mass': np.round(rng.random(n), 2),
+    })
+    df.loc[::13, 'Sc'] = np.nan
+    session = session_for(df)
+    rows, counts = ce.fill_gaps(session, 'DOY', 'leaf_mass', 1, None, None, None)
+    expected = []
+    for (species, site), _ in counts:
+        order = ce.interpolation_order(session['df'], 'DOY', [species], [site])
+        x = session['df']['DOY'].to_numpy()[order]
+        missing = np.setdiff1d(np.arange(x.min(), x.max() + 1), x)
+        expected.append(ce.interpolate_rows(session['df'], missing, None, 'DOY', 'leaf_mass', order,
+                                            {'Sc': species, 'SiteC': site}))
+    pd.testing.assert_frame_equal(rows, pd.concat(expected, ignore_index=True))
+
+
+def test_fill_gaps_skips_rows_without_species_or_site():
+    df = make_frame()
+    df['Sc'] = df['Sc'].astype(object)
+    df.loc[[1, 3], 'Sc'] = None
+    rows, counts = ce.fill_gaps(session_for(df), 'DOY', 'leaf_mass', 10, None, None, None)
+    assert [group for group, _ in counts] == [('oak', 'A'), ('pine', 'A')]
+    assert rows['Sc'].notna().all()
@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+
+import charts_edit as ce
+
+
+def test_compact_dtypes_schema():
+    df = ce.compact_dtypes(pd.DataFrame({
+        'Sc': ['oak', 'pine'] * 50,
+        'DOY': np.arange(100, dtype=np.int64),
+        'leaf_mass': np.round(np.linspace(0.5, 1.5, 100), 2),
+        'precise': np.linspace(0, 1, 100) / 3,
+        'Note': [f'note {i}' for i in range(100)],
+    }))
+    assert isinstance(df['Sc'].dtype, pd.CategoricalDtype)
+    assert df['DOY'].dtype == np.int16
+    assert df['leaf_mass'].dtype == np.float32
+    assert df['precise'].dtype == np.float64  # float32 would lose digits
+    assert not isinstance(df['Note'].dtype, pd.CategoricalDtype)
+
+
+def test_sniff_delimiter():
+    assert ce.sniff_delimiter(b'Sc,SiteC,DOY\noak,A,100\n', 'data.txt') == ','
+    assert ce.sniff_delimiter(b'Sc\tSiteC\tDOY\noak\tA\t100\n', 'data.csv') == '\t'
+
+
+def write_table(tmp_path, n=1000):
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        'Sc': rng.choice(['oak', 'pine', 'elm'], n),
+        'SiteC': rng.integers(1, 5, n),  # numeric site codes
+        'Description': rng.choice(['leaf', 'bud'], n).astype(object),
+        'DOY': rng.integers(1, 365, n),
+        'leaf_mass': np.round(rng.random(n), 2),
+        'precise': rng.random(n) / 3,
+        'Note': [f'note {i}' for i in range(n)],
+        'gappy': np.where(np.arange(n) < n // 2, 7, np.nan),  # integers in the first chunks only
+    })
+    df.loc[600:, 'Description'] = None  # text in the first chunks only
+    path = tmp_path / 'data.txt'
+    df.to_csv(path, sep='\t', index=False)
+    return path
+
+
+def test_chunked_parse_matches_whole_file_parse(tmp_path, monkeypatch):
+    monkeypatch.setattr(ce, 'PARSE_CHUNK_ROWS', 150)
+    path = write_table(tmp_path)
+    expected = ce.compact_dtypes(pd.read_csv(path, sep='\t'))
+    df, n_chunks = ce.read_table_chunked(path, '\t')
+    assert n_chunks == 7
+    assert df['SiteC'].dtype == np.int16  # numeric filter columns are not made Categorical
+    pd.testing.assert_frame_equal(df, expected)
+
+
+def test_chunked_parse_reports_progress(tmp_path, monkeypatch):
+    monkeypatch.setattr(ce, 'PARSE_CHUNK_ROWS', 400)
+    path = write_table(tmp_path)
+    reports = []
+    ce.read_table_chunked(path, '\t', lambda rows, parsed_bytes: reports.append((rows, parsed_bytes)))
+    assert [rows for rows, _ in reports] == [400, 800, 1000]
+    assert reports[-1][1] == path.stat().st_size
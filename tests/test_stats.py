@@ -0,0 +1,79 @@
+import math
+import uuid
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import charts_edit as ce
+
+
+def assert_stats_match(stats, values):
+    series = pd.Series(values, dtype=np.float64)
+    assert stats.count == series.count()
+    assert stats.mean == pytest.approx(series.mean(), rel=1e-9)
+    assert stats.std == pytest.approx(series.std(), rel=1e-9)
+    if stats.exact:
+        assert stats.min == series.min()
+        assert stats.max == series.max()
+
+
+def test_running_stats_follow_adds_removes_and_replacements():
+    rng = np.random.default_rng(0)
+    values = list(np.round(rng.random(50) * 10, 2))
+    stats = ce.RunningStats(values + [np.nan])
+    assert_stats_match(stats, values)
+    for _ in range(200):
+        action = rng.integers(3)
+        if action == 0:
+            value = float(np.round(rng.random() * 10, 2))
+            stats.add(value)
+            values.append(value)
+        elif action == 1 and len(values) > 2:
+            stats.remove(values.pop(rng.integers(len(values))))
+        else:
+            position = rng.integers(len(values))
+            new_value = float(np.round(rng.random() * 10, 2))
+            stats.replace(values[position], new_value)
+            values[position] = new_value
+        assert_stats_match(stats, values)
+
+
+def test_removing_an_extreme_clears_exact():
+    stats = ce.RunningStats([1.0, 2.0, 3.0, 4.0])
+    stats.remove(2.0)
+    assert stats.exact and (stats.min, stats.max) == (1.0, 4.0)
+    stats.add(0.5)
+    assert stats.exact and stats.min == 0.5
+    stats.remove(4.0)
+    assert not stats.exact
+
+
+def test_running_stats_of_empty_and_nan_values():
+    stats = ce.RunningStats([np.nan, None])
+    assert stats.count == 0 and math.isnan(stats.mean) and math.isnan(stats.min)
+    stats.add(2.0)
+    stats.add(math.nan)
+    assert (stats.count, stats.mean, stats.min, stats.max) == (1, 2.0, 2.0, 2.0)
+    assert math.isnan(stats.std)
+    stats.remove(2.0)
+    assert stats.count == 0 and math.isnan(stats.max)
+
+
+@pytest.mark.parametrize('row_id, new_value', [(2, 0.35), (3, 0.05)])  # interior move, maximum moved inward
+def test_advance_running_stats_matches_a_rebuild(row_id, new_value):
+    df = pd.DataFrame({'DOY': np.arange(100, 104, dtype=np.int16), 'leaf_mass': [0.1, 0.2, 0.3, 0.4]})
+    session = ce.new_session_state()
+    session.update(rows=ce.RowBuffer(df), edit_log=ce.EditLog(), dataset_id=uuid.uuid4().hex, version=1)
+    ce.sync_frame(session)
+    ce.get_running_stats(session, None, None, None, 'leaf_mass', session['df'])
+
+    old_value = float(session['df'].at[row_id, 'leaf_mass'])
+    ce.apply_edit(session['rows'], {'op': 'set', 'cells': [(row_id, 'leaf_mass', old_value, new_value)]})
+    ce.sync_frame(session)
+    session['version'] = 2
+    ce.advance_running_stats(session, 1, None, None, None, 'leaf_mass', [(old_value, new_value)])
+
+    stats = ce.get_running_stats(session, None, None, None, 'leaf_mass', session['df'])
+    assert stats.exact
+    assert_stats_match(stats, session['df']['leaf_mass'].tolist())
@@ -0,0 +1,228 @@
+import json
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import charts_edit as ce
+
+
+def make_frame(n=8):
+    return pd.DataFrame({
+        'Sc': pd.Categorical(['oak', 'pine'] * (n // 2)),
+        'SiteC': pd.Categorical(['A'] * n),
+        'DOY': np.arange(100, 100 + n, dtype=np.int16),
+        'leaf_mass': np.round(np.linspace(0.5, 1.2, n), 2).astype(np.float32),
+        'Note': pd.Series([f'n{i}' for i in range(n)], dtype=object),
+    })
+
+
+def edit(rows, edit_log, entry):
+    """Apply and record an edit the way the callbacks do"""
+    ce.apply_edit(rows, entry)
+    edit_log.record(entry)
+    return entry
+
+
+def add_row(rows, edit_log, **values):
+    new_id = int(rows.append(pd.DataFrame([values]))[0])
+    entry = {'op': 'add', 'rows': rows.frame().loc[[new_id]]}
+    edit_log.record(entry)
+    return entry
+
+
+def test_undo_redo_after_deletes():
+    rows, edit_log = ce.RowBuffer(make_frame()), ce.EditLog()
+    snapshots = [rows.frame().copy()]
+    edit(rows, edit_log, {'op': 'set', 'cells': [(2, 'leaf_mass', 0.7, 0.81), (2, 'Note', 'n2', 'moved')]})
+    snapshots.append(rows.frame().copy())
+    edit(rows, edit_log, {'op': 'delete', 'rows': rows.frame().loc[[1, 3, 6]]})
+    snapshots.append(rows.frame().copy())
+    edit(rows, edit_log, {'op': 'delete', 'rows': rows.frame().loc[[0]]})
+    snapshots.append(rows.frame().copy())
+    add_row(rows, edit_log, Sc='birch', SiteC='B', DOY=200, leaf_mass=0.33, Note='new')
+    snapshots.append(rows.frame().copy())
+
+    # Categories added by an edit stay on undo, so only the values are compared
+    for expected in reversed(snapshots[:-1]):
+        edit_log.undo(rows)
+        pd.testing.assert_frame_equal(rows.frame(), expected, check_categorical=False)
+    assert edit_log.undo(rows) is None
+    for expected in snapshots[1:]:
+        edit_log.redo(rows)
+        pd.testing.assert_frame_equal(rows.frame(), expected, check_categorical=False)
+    assert edit_log.redo(rows) is None
+    # Row IDs are never reused, even after the deleted rows were compacted away
+    assert rows.frame().index.tolist() == [2, 4, 5, 7, 8]
+
+
+def test_undo_all_restores_the_upload():
+    original = make_frame()
+    rows, edit_log = ce.RowBuffer(original), ce.EditLog()
+    edit(rows, edit_log, {'op': 'delete', 'rows': rows.frame().loc[[4, 5]]})
+    edit(rows, edit_log, {'op': 'set', 'cells': [(7, 'DOY', 107, 150)]})
+    edit_log.undo_all(rows)
+    pd.testing.assert_frame_equal(rows.frame(), original)
+    assert len(edit_log.done) == 0 and len(edit_log.undone) == 2
+
+
+def session_state(df):
+    state = ce.new_session_state()
+    state.update(rows=ce.RowBuffer(df), edit_log=ce.EditLog(), source_key='test', x_col='DOY', y_col='leaf_mass')
+    return state
+
+
+def journaled_edit(journal, state, entry):
+    edit(state['rows'], state['edit_log'], entry)
+    journal.append('s1', state, ('edit', entry))
+
+
+def test_replay_matches_live_session_after_checkpoint(tmp_path):
+    journal = ce.EditJournal(str(tmp_path), compact_bytes=600, max_bytes=1 << 30)
+    state = session_state(make_frame(40))
+    journal.start('s1', state)
+    for row_id in range(10):
+        old = ce.plain_value(state['rows'].frame().at[row_id, 'leaf_mass'])
+        journaled_edit(journal, state, {'op': 'set', 'cells': [(row_id, 'leaf_mass', old, 2.5 + row_id)]})
+    assert (tmp_path / 's1.ckpt').exists()
+    journaled_edit(journal, state, {'op': 'delete', 'rows': state['rows'].frame().loc[[11, 12]]})
+    state['edit_log'].undo(state['rows'])
+    journal.append('s1', state, ('undo',))
+    state['x_col'] = 'Note'
+    journal.append('s1', state, ('state', {'x_col': 'Note'}))
+
+    replayed = journal.replay('s1')
+    pd.testing.assert_frame_equal(replayed['rows'].frame(), state['rows'].frame())
+    assert len(replayed['edit_log'].done) == len(state['edit_log'].done)
+    assert len(replayed['edit_log'].undone) == len(state['edit_log'].undone)
+    assert replayed['x_col'] == 'Note'
+    assert replayed['journal_seq'] == state['journal_seq']
+    # The replayed history still undoes to the upload
+    replayed['edit_log'].undo_all(replayed['rows'])
+    pd.testing.assert_frame_equal(replayed['rows'].frame(), make_frame(40))
+
+
+def test_replay_truncates_a_corrupt_tail(tmp_path):
+    journal = ce.EditJournal(str(tmp_path), compact_bytes=1 << 20, max_bytes=1 << 30)
+    state = session_state(make_frame())
+    journal.start('s1', state)
+    journaled_edit(journal, state, {'op': 'set', 'cells': [(0, 'DOY', 100, 90)]})
+    path = tmp_path / 's1.journal'
+    good_size = path.stat().st_size
+    with open(path, 'ab') as f:
+        f.write(b'\x80\x05\x95\xff\xff\xff\xff\xff\xff\xff\x7f not a record')
+
+    replayed = journal.replay('s1')
+    pd.testing.assert_frame_equal(replayed['rows'].frame(), state['rows'].frame())
+    assert path.stat().st_size == good_size
+    journaled_edit(journal, replayed, {'op': 'set', 'cells': [(1, 'DOY', 101, 91)]})
+    assert journal.replay('s1')['rows'].frame().loc[1, 'DOY'] == 91
+
+
+def test_journal_keeps_float32_values_short(tmp_path):
+    rows = ce.RowBuffer(make_frame())
+    record = ce.EditJournal.encode_entry({'op': 'delete', 'rows': rows.frame().loc[[3]]})
+    assert record['values']['leaf_mass'] == [0.8]
+
+
+def test_patch_round_trip_reproduces_edited_frame():
+    original = make_frame(12)
+    rows, edit_log = ce.RowBuffer(original), ce.EditLog()
+    edit(rows, edit_log, {'op': 'set', 'cells': [(1, 'leaf_mass', 0.56, 0.77), (5, 'Sc', 'pine', 'larch'),
+                                                  (9, 'Note', 'n9', None)]})
+    edit(rows, edit_log, {'op': 'delete', 'rows': rows.frame().loc[[0, 7]]})
+    add_row(rows, edit_log, Sc='oak', SiteC='C', DOY=250, leaf_mass=np.nan, Note='added')
+    edited = rows.frame()
+
+    # Export writes the patch as JSON and import reads it back
+    patch = json.loads(json.dumps(ce.diff_frames(original, edited, 'test')))
+    assert patch['modified']['leaf_mass']['values'] == [0.77]
+    assert patch['removed'] == [0, 7]
+    patched = ce.RowBuffer(original)
+    for entry in ce.patch_edits(original, patch):
+        ce.apply_edit(patched, entry)
+    pd.testing.assert_frame_equal(patched.frame(), edited, check_categorical=False)
+
+
+def test_patch_from_another_file_is_rejected():
+    patch = ce.diff_frames(make_frame(8), make_frame(8), 'test')
+    with pytest.raises(ValueError):
+        ce.patch_edits(make_frame(10), patch)
+
+
+def test_row_buffer_pickles_live_rows_only():
+    rows = ce.RowBuffer(make_frame())
+    rows.delete_rows([2, 3])
+    restored = pickle.loads(pickle.dumps(rows))
+    pd.testing.assert_frame_equal(restored.frame(), rows.frame())
+    assert restored.next_id == rows.next_id
+
+
+def test_float32_column_widens_for_values_it_cannot_hold():
+    rows, edit_log = ce.RowBuffer(make_frame()), ce.EditLog()
+    edit(rows, edit_log, {'op': 'delete', 'rows': rows.frame().loc[[0]]})
+    edit(rows, edit_log, {'op': 'set', 'cells': [(1, 'leaf_mass', 0.6, 0.65)]})
+    assert rows.frame()['leaf_mass'].dtype == np.float32
+    edit(rows, edit_log, {'op': 'set', 'cells': [(2, 'leaf_mass', 0.7, 98765.4321)]})
+    assert rows.frame()['leaf_mass'].dtype == np.float64
+    assert rows.frame()['leaf_mass'].tolist()[:3] == [0.65, 98765.4321, 0.8]
+    # Rows restored from the float32 era keep the values they printed as
+    edit_log.undo_all(rows)
+    assert rows.frame()['leaf_mass'].tolist() == [0.5, 0.6, 0.7, 0.8, 0.9, 1.0, 1.1, 1.2]
+
+
+def test_plot_values_send_float32_cells_as_printed():
+    frame = make_frame()
+    assert ce.plot_values(frame['leaf_mass'])[:2] == [0.5, 0.6]
+    assert ce.plot_values(frame['DOY'])[:2] == [100, 101]
+
+
+def test_round_float_noise():
+    assert ce.round_float_noise(0.43 + 0.02) == 0.45
+    assert ce.round_float_noise([98765.4321, -0.1 - 0.2]).tolist() == [98765.4321, -0.3]
+    assert np.isnan(ce.round_float_noise(np.nan))
+
+
+@pytest.mark.skipif(not hasattr(os, 'getuid'), reason='POSIX ownership')
+def test_disk_store_directory_is_private(tmp_path):
+    directory = tmp_path / 'sessions'
+    store = ce.DiskSessionStore(str(directory), max_bytes=1 << 30, cache_bytes=0)
+    assert directory.stat().st_mode & 0o777 == 0o700
+    store.bump_version('s1', markers=[1])
+    assert store.get('s1')['markers'] == [1]
+
+
+@pytest.mark.skipif(not hasattr(os, 'getuid'), reason='POSIX ownership')
+def test_disk_store_refuses_a_directory_others_can_write(tmp_path):
+    directory = tmp_path / 'sessions'
+    directory.mkdir(mode=0o777)
+    directory.chmod(0o777)
+    with pytest.raises(PermissionError):
+        ce.DiskSessionStore(str(directory), max_bytes=1 << 30, cache_bytes=0)
+    if os.getuid() == 0:
+        directory.chmod(0o700)
+        os.chown(directory, 12345, -1)  # planted by another user
+        with pytest.raises(PermissionError):
+            ce.DiskSessionStore(str(directory), max_bytes=1 << 30, cache_bytes=0)
+
+
+@pytest.mark.skipif(not hasattr(os, 'getuid'), reason='POSIX ownership')
+def test_journal_refuses_a_directory_others_can_write(tmp_path):
+    ce.EditJournal(str(tmp_path / 'journal'), compact_bytes=600, max_bytes=1 << 30)
+    assert (tmp_path / 'journal').stat().st_mode & 0o777 == 0o700
+    shared = tmp_path / 'shared'
+    shared.mkdir()
+    shared.chmod(0o777)
+    with pytest.raises(PermissionError):
+        ce.EditJournal(str(shared), compact_bytes=600, max_bytes=1 << 30)
+
+
+def test_session_store_backends_must_implement_storage():
+    class ReadOnlyStore(ce.SessionStore):
+        def _read(self, session_id):
+            return None
+
+    with pytest.raises(TypeError):
+        ReadOnlyStore(max_bytes=0)